@@ -1,4 +1,5 @@
 import streamlit as st
+from utilities import io_metrics
 
 
 def info():
@@ -14,5 +15,7 @@ pages = [
             st.Page(info, title="Info")
         ]
 
+io_metrics.start_http_server()
+
 pg = st.navigation(pages, position="top")
 pg.run()
@@ -0,0 +1,53 @@
+"""
+    Compare the row-wise apply conversion with the vectorized rate-matrix gather.
+
+    Run with: python -m benchmarks.bench_conversion
+"""
+import time
+import numpy as np
+import pandas as pd
+from utilities import conversion
+
+RATES = {"USD": 1.08, "PLN": 4.31, "GBP": 0.85, "CHF": 0.94, "SEK": 11.2}
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def make_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 2000, n), unit="D")
+    return pd.DataFrame({
+        "earning": rng.normal(0, 500, n).round(2),
+        "currency": rng.choice(["EUR", *RATES], n),
+        # A fifth of the positions are still open
+        "date_sell": pd.Series(dates).where(rng.random(n) > 0.2),
+    })
+
+
+def convert_row(row, rates):
+    """Previous implementation: one Python call per row"""
+    if row["currency"] in rates and not pd.isna(row["date_sell"]):
+        return round(row["earning"] / rates[row["currency"]], 2)
+    return round(row["earning"], 2)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    matrix = conversion.from_rates(RATES)
+    print(f"{'rows':>10} {'apply (s)':>10} {'vectorized (s)':>15} {'speedup':>8}")
+    for n in SIZES:
+        df = make_frame(n)
+        slow, expected = timed(lambda: df.apply(lambda row: convert_row(row, RATES), axis=1))
+        fast, result = timed(lambda: conversion.to_eur(df["earning"], df["currency"], matrix,
+                                                        mask=df["date_sell"].notna()).round(2))
+        # NumPy and Python break half-cent ties differently, hence the one-cent tolerance
+        assert np.allclose(expected.to_numpy(dtype=float), result.to_numpy(), atol=0.011)
+        print(f"{n:>10,} {slow:>10.3f} {fast:>15.4f} {slow / fast:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+    Seeded generator of synthetic `transactions` frames shaped like the production table.
+"""
+import numpy as np
+import pandas as pd
+
+CURRENCIES = ["EUR", "USD", "PLN"]
+CURRENCY_WEIGHTS = [0.5, 0.35, 0.15]
+START = pd.Timestamp("2019-01-01")
+HISTORY_DAYS = 6 * 365
+
+
+def make_tickers(count, rng):
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    return ["".join(rng.choice(letters, 4)) + str(i) for i in range(count)]
+
+
+def make_transactions(n, owners=50, tickers=500, open_share=0.2, dividend_share=0.3, cash_share=0.02,
+                      seed=0, today=None):
+    """
+        Return n synthetic transactions with mixed currencies, open and closed lots, dividends and many owners.
+
+        A small share of rows are monthly "Salary" / "Savings" entries, like the real table.
+    """
+    rng = np.random.default_rng(seed)
+    today = pd.Timestamp(today or START + pd.Timedelta(days=HISTORY_DAYS)).normalize()
+    symbols = np.array(make_tickers(tickers, rng))
+    owner_names = np.array([f"owner{i}" for i in range(owners)])
+
+    ticker_idx = rng.integers(0, tickers, n)
+    date_buy = START + pd.to_timedelta(rng.integers(0, HISTORY_DAYS, n), unit="D")
+    holding = pd.to_timedelta(rng.integers(1, 400, n), unit="D")
+    date_sell = pd.Series(date_buy + holding)
+    is_open = (rng.random(n) < open_share) | (date_sell > today).to_numpy()
+    date_sell[is_open] = pd.NaT
+
+    price_buy = np.round(rng.lognormal(3.5, 1.0, n), 3)
+    quantity = np.round(rng.uniform(1, 50, n), 2)
+    price_sell = np.round(price_buy * rng.lognormal(0.02, 0.25, n), 3)
+    dividends = np.where(rng.random(n) < dividend_share, np.round(rng.uniform(0, 0.05, n) * price_buy * quantity, 2), 0)
+
+    df = pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "stock": np.char.add("Stock ", symbols[ticker_idx]),
+        "ticker": symbols[ticker_idx],
+        "price_buy": price_buy,
+        "date_buy": date_buy.date,
+        "quantity_buy": quantity,
+        "price_sell": np.where(is_open, np.nan, price_sell),
+        "date_sell": date_sell.dt.date.where(~is_open, None),
+        "quantity_sell": np.where(is_open, np.nan, quantity),
+        "currency": rng.choice(CURRENCIES, n, p=CURRENCY_WEIGHTS),
+        "dividends": np.where(is_open, 0, dividends),
+        "owner": owner_names[rng.integers(0, owners, n)],
+    })
+
+    # Salary rows carry income in price_sell and expenses in price_buy; savings only price_sell
+    cash = rng.random(n) < cash_share
+    df.loc[cash, "stock"] = rng.choice(["Salary", "Savings"], cash.sum())
+    df.loc[cash, ["ticker"]] = None
+    df.loc[cash, "currency"] = "PLN"
+    return df
+
+
+def make_closes(tickers, start, end, seed=0):
+    """Random-walk daily closes, a day by ticker frame like price_store.get_closes"""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(start, end, freq="D")
+    steps = rng.normal(0.0003, 0.02, (len(days), len(tickers)))
+    closes = 50 * np.exp(np.cumsum(steps, axis=0))
+    return pd.DataFrame(closes, index=days, columns=list(tickers))
@@ -0,0 +1,148 @@
+"""
+    Time and peak memory of the calculation and chart functions on synthetic transactions.
+
+    python -m benchmarks.run --sizes 1000 10000 100000 --save baseline.json
+    python -m benchmarks.run --compare baseline.json        # exits 1 on regressions
+    python -m benchmarks.run --snapshot .cache/transactions.parquet   # real data instead of synthetic
+"""
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from benchmarks import generator, stubs
+from utilities import calculations, charts, equity, schema, storage
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# A case slower than baseline by more than this share counts as a regression
+TOLERANCE = 0.25
+
+
+def prepare(df):
+    """Build every input once per size so that cases time only the function itself"""
+    trades = df[~df["stock"].isin(["Salary", "Savings"])]
+    if "owner" not in trades.columns:
+        # Snapshots taken before transactions had an owner (sql/002_transactions_owner.sql)
+        trades = trades.assign(owner="owner")
+    metrics = calculations.calculate_metrics(trades, stubs.RATES)
+    # Pages chart a single owner: take the busiest one
+    owner = metrics["owner"].value_counts().index[0]
+    lots = metrics[metrics["owner"] == owner]
+    daily = calculations.create_daily_cumulative(lots)
+    chart_df = daily.pivot(index="date_sell", columns="owner", values="cumulative").ffill()
+    closed = lots[lots["date_sell"].notna()]
+    first_buy = lots["date_buy"].min()
+    closes = stubs.stub_closes(lots["ticker"].unique(), first_buy, generator.START + pd.Timedelta(days=generator.HISTORY_DAYS))
+    grid = charts.calendar_grid.__wrapped__(daily, None)
+    return {"trades": trades, "metrics": metrics, "lots": lots, "daily": daily, "chart_df": chart_df,
+            "closed": closed, "closes": closes, "grid": grid}
+
+
+CASES = {
+    "find_start": lambda d: calculations.find_start(d["trades"], "1Y"),
+    "calculate_metrics": lambda d: calculations.calculate_metrics(d["trades"], stubs.RATES),
+    "find_capital": lambda d: calculations.find_capital(d["metrics"], stubs.RATES),
+    "calculate_owner_stats": lambda d: calculations.calculate_owner_stats.__wrapped__(d["metrics"]),
+    "create_daily_cumulative": lambda d: calculations.create_daily_cumulative(d["metrics"]),
+    "get_current_prices": lambda d: calculations.get_current_prices(d["lots"]),
+    "daily_equity_curve": lambda d: equity.daily_equity_curve(d["lots"], d["closes"], stubs.RATES),
+    "modern_portfolio_chart": lambda d: charts.modern_portfolio_chart(d["chart_df"]),
+    "top_worst_graph": lambda d: charts.top_worst_graph(True, d["closed"].nlargest(3, "earning"), "#10b981", "Best"),
+    "ring_chart": lambda d: charts.ring_chart(d["closed"]),
+    "calendar_grid": lambda d: charts.calendar_grid.__wrapped__(d["daily"], None),
+    "heatmap": lambda d: charts.heatmap(d["grid"]),
+}
+
+
+def measure(fn, data, repeats):
+    """Best wall time of several runs, and peak traced memory of one more run"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(data)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": min(times), "peak_mb": peak / 2 ** 20}
+
+
+def frames(sizes, snapshot=None):
+    """(rows, transactions) to run on: the snapshot as it is, or one synthetic frame per size"""
+    if snapshot:
+        df = storage.read_snapshot(snapshot)
+        yield len(df), df
+        return
+    for n in sizes:
+        yield n, schema.normalise_transactions(generator.make_transactions(n))
+
+
+def run(sizes, cases, repeats, snapshot=None):
+    results = {name: {} for name in cases}
+    with stubs.offline():
+        for n, df in frames(sizes, snapshot):
+            data = prepare(df)
+            for name in cases:
+                results[name][str(n)] = measure(CASES[name], data, repeats)
+                r = results[name][str(n)]
+                print(f"{name:<25} {n:>10,} {r['seconds'] * 1000:>11.2f} ms {r['peak_mb']:>9.1f} MB", flush=True)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print the time ratio against the baseline and return the regressed (case, size) pairs"""
+    regressions = []
+    print(f"\n{'case':<25} {'rows':>10} {'baseline':>12} {'now':>12} {'ratio':>7}")
+    for name, by_size in results.items():
+        for n, r in by_size.items():
+            base = baseline.get("results", {}).get(name, {}).get(n)
+            if not base:
+                continue
+            ratio = r["seconds"] / base["seconds"] if base["seconds"] else float("inf")
+            flag = " !" if ratio > 1 + tolerance else ""
+            print(f"{name:<25} {int(n):>10,} {base['seconds'] * 1000:>9.2f} ms {r['seconds'] * 1000:>9.2f} ms "
+                  f"{ratio:>6.2f}x{flag}")
+            if flag:
+                regressions.append((name, n))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--only", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--snapshot", help="Parquet snapshot (python -m utilities.storage snapshot) to use "
+                                           "instead of synthetic data; --sizes is then ignored")
+    args = parser.parse_args(argv)
+
+    print(f"{'case':<25} {'rows':>10} {'time':>14} {'peak mem':>12}")
+    results = run(args.sizes, args.only, args.repeats, args.snapshot)
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
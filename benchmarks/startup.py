@@ -0,0 +1,102 @@
+"""
+    Import time of every page up to the login form, per module, with a budget check.
+
+    Each page runs its module-level imports before require_auth stops at the login form, so those imports are
+    what a cold start or a first login waits for. Heavy dependencies (yfinance, SQLAlchemy, requests, openpyxl)
+    must only be imported by the code path that needs them.
+
+    python -m benchmarks.startup                        # profile every page
+    python -m benchmarks.startup --budget-ms 1500       # exits 1 over budget or on an eager heavy import
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# app.py runs first, then the page it navigates to
+APP = "app.py"
+PAGES = ["home.py", "income_details.py", "investments_details.py"]
+# Modules no page may import before login; pandas, numpy, streamlit (and the Plotly and pyarrow they import
+# themselves) are needed by every page and stay eager
+DEFERRED = ["yfinance", "sqlalchemy", "requests", "urllib3", "openpyxl"]
+DEFAULT_BUDGET_MS = 1500
+# Imports are timed this many times and the fastest run kept, so a cold disk cache does not count
+DEFAULT_REPEAT = 3
+
+
+def top_level_imports(path):
+    """Source of the import statements at module level of a script"""
+    with open(os.path.join(ROOT, path)) as f:
+        tree = ast.parse(f.read(), filename=path)
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def profile(code):
+    """
+        Run code in a fresh interpreter under -X importtime.
+
+        Returns the cumulative microseconds of every module, and the modules imported directly by code
+        (the ones the total is the sum of).
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            env={**os.environ, "PYTHONPATH": ROOT}, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    cumulative, top = {}, []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, value, name = line.split("|")
+        module = name.strip()
+        cumulative[module] = int(value)
+        if name[1:] == module:
+            top.append(module)
+    return cumulative, top
+
+
+def best_profile(code, repeat):
+    """profile with the lowest total of repeat runs"""
+    runs = [profile(code) for _ in range(repeat)]
+    return min(runs, key=lambda run: sum(run[0][m] for m in run[1]))
+
+
+def report(page, cumulative, top, limit):
+    total = sum(cumulative[m] for m in top) / 1000
+    print(f"\n{page}: {total:.0f} ms")
+    for module in sorted(cumulative, key=cumulative.get, reverse=True)[:limit]:
+        print(f"  {cumulative[module] / 1000:8.1f} ms  {module}")
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", nargs="+", default=PAGES)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="import time allowed per page")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--top", type=int, default=15, help="modules listed per page")
+    args = parser.parse_args(argv)
+
+    failures = []
+    app = top_level_imports(APP)
+    for page in args.pages:
+        code = app + "\n" + top_level_imports(page)
+        cumulative, top = best_profile(code, args.repeat)
+        total = report(page, cumulative, top, args.top)
+        eager = [m for m in DEFERRED if m in cumulative]
+        if eager:
+            failures.append(f"{page} imports {', '.join(eager)} before login")
+        if total > args.budget_ms:
+            failures.append(f"{page} takes {total:.0f} ms to import, over the {args.budget_ms:.0f} ms budget")
+
+    print()
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if not failures:
+        print(f"OK every page imports in under {args.budget_ms:.0f} ms")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
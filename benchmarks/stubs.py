@@ -0,0 +1,40 @@
+"""
+    Offline stand-ins for the FX, quote and price history providers.
+"""
+import contextlib
+from unittest import mock
+import numpy as np
+import pandas as pd
+from utilities import fx_store, price_store, quotes
+from benchmarks import generator
+
+RATES = {"USD": 1.08, "PLN": 4.31}
+
+
+def stub_rates(currencies, start, end):
+    """Flat daily rates, same shape as fx_store.get_rates"""
+    days = pd.date_range(start, end, freq="D")
+    currencies = sorted(c for c in set(currencies) if c in RATES)
+    return pd.DataFrame({
+        "currency": np.repeat(currencies, len(days)),
+        "date": np.tile(days, len(currencies)),
+        "rate": np.repeat([RATES[c] for c in currencies], len(days)),
+    })
+
+
+def stub_prices(tickers):
+    """Deterministic last price per ticker, same shape as quotes.get_prices"""
+    return {ticker: 20 + sum(map(ord, ticker)) % 180 for ticker in tickers}
+
+
+def stub_closes(tickers, start, end):
+    return generator.make_closes(sorted(tickers), start, end)
+
+
+@contextlib.contextmanager
+def offline():
+    """Patch every network-backed provider with its stub"""
+    with mock.patch.object(fx_store, "get_rates", stub_rates), \
+            mock.patch.object(quotes, "get_prices", stub_prices), \
+            mock.patch.object(price_store, "get_closes", stub_closes):
+        yield
@@ -1,17 +1,19 @@
 import streamlit as st
-from utilities import calculations
-from utilities.auth import require_auth
+from utilities import calculations, instrumentation
+from utilities.auth import current_owner, performance_panel, require_auth
 
 
 def main():
     if "authenticated" not in st.session_state:
         st.session_state.authenticated = False
 
-    require_auth(dev_run=False)
+    instrumentation.begin_render("home")
+    require_auth(dev_run=False, period=st.session_state.get("period", calculations.DEFAULT_PERIOD))
 
     df = st.session_state.get("df")
-    usd = st.session_state.get("usd")
+    owner = current_owner()
     pln = st.session_state.get("pln")
+    rates = st.session_state.get("rates")
 
     marginl, center, marginr = st.columns([1, 8, 1])
     with center:
@@ -21,7 +23,8 @@ def main():
             st.write("")
         with col_2:
             st.write("")
-            start = st.segmented_control(None, ["1M", "3M", "6M", "YTD", "1Y", "∞"], default='1Y', selection_mode='single')
+            start = st.segmented_control(None, calculations.PERIODS, default=calculations.DEFAULT_PERIOD,
+                                         selection_mode='single', key="period")
             df = calculations.find_start(df, start)
         with col_3:
             st.write("")
@@ -57,17 +60,19 @@ def main():
                 calculations.create_card("🏦 Savings", savings, curr)
             st.write("")
 
-    def investments(df, usd, pln):
+    def investments(df, rates, pln):
         marginl, center, marginr = st.columns([1, 8, 1])
         with center:
             st.subheader("Investments", anchor=False)
             saving_df = df[df["stock"] == 'Savings']
             saving = saving_df["price_sell"].sum()
             df = df[~df["stock"].isin(["Salary", "Savings"])]
-            df["owner"] = "Gim"
-            df_with_metrics = calculations.calculate_metrics(df, usd, pln, True)
+            df_with_metrics = calculations.calculate_metrics(df, rates, True)
             owner_stats = calculations.calculate_owner_stats(df_with_metrics)
-            stats = owner_stats['Gim']
+            if owner not in owner_stats.index:
+                st.info("No investments yet.")
+                return
+            stats = owner_stats.to_dict("index")[owner]
             tax_due = (stats['total_earnings'] * 19)/100
             net_investments = stats['total_earnings'] - tax_due
             if curr == 'zł':
@@ -87,10 +92,13 @@ def main():
                 calculations.create_card("💵 Net Balance", net_investments + saving, curr)
 
     try:
-        salary(df)
+        with instrumentation.span("page.salary"):
+            salary(df)
     except Exception:
         pass
-    investments(df, usd, pln)
+    with instrumentation.span("page.investments"):
+        investments(df, rates, pln)
+    performance_panel()
 
 
 if __name__ == '__main__':
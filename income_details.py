@@ -1,9 +1,16 @@
+import numpy as np
 import streamlit as st
 import plotly.graph_objects as go
-from utilities.auth import require_auth
+from utilities import instrumentation, plotting
+from utilities.auth import performance_panel, require_auth
 
 
-def graph(df, date, object, color, height=300):
+@instrumentation.timed("income.graph")
+def graph(df, date, object, color, height=300, negative_color=None):
+    # Long histories are summed per week, month or quarter so the bar count stays bounded
+    df = plotting.bin_bars(df, date, [object])
+    if negative_color:
+        color = np.where(df[object].fillna(0) < 0, negative_color, color)
     fig = go.Figure()
     # Add bar trace with modern styling
     fig.add_trace(go.Bar(
@@ -28,7 +35,7 @@ def graph(df, date, object, color, height=300):
         yaxis=dict(
             showgrid=True,
             showticklabels=True,  # Hide Y-axis scale numbers
-            range=[-1000, 9000],
+            range=plotting.axis_range(df[object]),
             visible=True  # Completely hide Y-axis
         ),
         plot_bgcolor='#1E1E1E',
@@ -41,7 +48,9 @@ def graph(df, date, object, color, height=300):
     return fig
 
 
+@instrumentation.timed("income.income_expense_graph")
 def income_expense_graph(df):
+    df = plotting.bin_bars(df, "date_buy", ["price_sell", "price_buy"])
     fig = go.Figure()
 
     # Income bars (positive, going up)
@@ -78,7 +87,7 @@ def income_expense_graph(df):
         ),
         yaxis=dict(
             showgrid=True,
-            range=[-1000, 9000],
+            range=plotting.axis_range(df["price_sell"], df["price_buy"]),
             zeroline=True
         ),
         plot_bgcolor='#1E1E1E',
@@ -99,6 +108,7 @@ def income_expense_graph(df):
     return fig
 
 
+@instrumentation.timed("income.cumulative_savings_graph")
 def cumulative_savings_graph(df):
     # Calculate cumulative sum
     df_cumulative = df.copy()
@@ -106,7 +116,8 @@ def cumulative_savings_graph(df):
 
     fig = go.Figure()
 
-    fig.add_trace(go.Scatter(
+    fig.add_trace(plotting.scatter(
+        len(df_cumulative),
         x=df_cumulative["date_buy"],
         y=df_cumulative["cumulative_savings"],
         mode='lines+markers',
@@ -117,7 +128,7 @@ def cumulative_savings_graph(df):
     ))
 
     fig.update_layout(
-        yaxis=dict(showgrid=True),
+        yaxis=dict(showgrid=True, range=plotting.axis_range(df_cumulative["cumulative_savings"])),
         plot_bgcolor='#1E1E1E',
         paper_bgcolor='#1E1E1E',
         font=dict(family='Arial', color='#e5e7eb'),
@@ -128,6 +139,7 @@ def cumulative_savings_graph(df):
     return fig
 
 
+@instrumentation.timed("income.ring_chart")
 def ring_chart(df):
     # Calculate totals
     total_earnings = df["price_sell"].sum()
@@ -160,6 +172,7 @@ def ring_chart(df):
 
 if "authenticated" not in st.session_state:
     st.session_state.authenticated = False
+instrumentation.begin_render("income")
 require_auth(dev_run=False)
 
 df = st.session_state.get("df")
@@ -186,11 +199,8 @@ with center:
 
 marginleft, col1, col2, col3, marginright = st.columns([9, 24, 16, 24, 9])
 with col1:
-    # Create a color column based on positive/negative values
-    df["color"] = df["savings"].apply(lambda x: "#ef4444" if x < 0 else "#10b981")
-
     st.markdown("<h4 style='text-align: center;'>Savings</h4>", unsafe_allow_html=True)
-    fig = graph(df, "date_buy", "savings", df["color"], 310)
+    fig = graph(df, "date_buy", "savings", "#10b981", 310, negative_color="#ef4444")
     st.plotly_chart(fig, width='stretch')
 with col3:
     st.markdown("<h4 style='text-align: center;'>Over time</h4>", unsafe_allow_html=True)
@@ -198,3 +208,5 @@ with col3:
 with col2:
     st.markdown("<h4 style='text-align: center;'>As part of earnings</h4>", unsafe_allow_html=True)
     st.plotly_chart(ring_chart(df), width='stretch')
+
+performance_panel()
@@ -0,0 +1,16 @@
+-- Track the last change of every transaction so load_data can fetch only new or updated rows.
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now();
+
+CREATE INDEX IF NOT EXISTS transactions_updated_at_idx ON transactions (updated_at);
+
+CREATE OR REPLACE FUNCTION transactions_touch_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at = now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS transactions_touch_updated_at ON transactions;
+CREATE TRIGGER transactions_touch_updated_at
+    BEFORE UPDATE ON transactions
+    FOR EACH ROW EXECUTE FUNCTION transactions_touch_updated_at();
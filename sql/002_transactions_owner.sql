@@ -0,0 +1,12 @@
+-- One table for a whole household or team: every transaction belongs to the user that owns it, and
+-- load_data reads only the logged-in user's rows.
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS owner text;
+
+-- Rows from before multi-owner support belong to the original single user: set their owner name here
+-- (the "owner" of that user in secrets.toml, or the username when it has none).
+UPDATE transactions SET owner = 'Gim' WHERE owner IS NULL;
+
+ALTER TABLE transactions ALTER COLUMN owner SET NOT NULL;
+
+-- Serves both the per-owner load and the per-owner period load (owner = :owner AND date_sell >= :since)
+CREATE INDEX IF NOT EXISTS transactions_owner_date_sell_idx ON transactions (owner, date_sell);
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+from utilities import conversion
+
+RATES = pd.DataFrame({
+    "currency": ["USD", "USD", "PLN", "PLN"],
+    "date": pd.to_datetime(["2024-01-02", "2024-01-04", "2024-01-02", "2024-01-04"]),
+    "rate": [1.1, 1.2, 4.0, 5.0],
+})
+EMPTY_RATES = pd.DataFrame({"currency": pd.Series(dtype=str), "date": pd.Series(dtype="datetime64[ns]"),
+                            "rate": pd.Series(dtype=float)})
+
+
+def test_to_eur_uses_the_last_fixing_on_or_before_each_date():
+    matrix = conversion.from_frame(RATES)
+    dates = pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-05", "2024-01-01"])
+    converted = conversion.to_eur(np.array([11.0, 11.0, 12.0, 40.0]), ["USD", "USD", "USD", "PLN"], matrix, dates)
+    # 2024-01-01 is before the first fixing and uses it
+    np.testing.assert_allclose(converted, [10.0, 10.0, 10.0, 10.0])
+
+
+def test_from_eur_inverts_to_eur():
+    matrix = conversion.from_rates({"USD": 1.25, "PLN": 4.0})
+    amounts = pd.Series([10.0, 20.0, 30.0], name="price")
+    currencies = ["EUR", "USD", "PLN"]
+    back = conversion.from_eur(conversion.to_eur(amounts, currencies, matrix), currencies, matrix)
+    pd.testing.assert_series_equal(back, amounts)
+
+
+def test_all_eur_with_an_empty_matrix():
+    matrix = conversion.from_frame(EMPTY_RATES)
+    dates = pd.to_datetime(["2024-01-02", "2024-01-03"])
+    np.testing.assert_allclose(conversion.to_eur(np.array([5.0, 7.0]), ["EUR", "EUR"], matrix, dates), [5.0, 7.0])
+
+
+def test_foreign_currency_with_an_empty_matrix_is_left_unconverted():
+    matrix = conversion.from_frame(EMPTY_RATES)
+    converted = conversion.to_eur(np.array([5.0]), ["USD"], matrix, pd.to_datetime(["2024-01-02"]))
+    np.testing.assert_allclose(converted, [5.0])
+
+
+def test_unknown_currency_is_left_unconverted():
+    matrix = conversion.from_rates({"USD": 2.0})
+    converted = conversion.to_eur(np.array([10.0, 10.0, 10.0]), ["USD", "CHF", "EUR"], matrix)
+    np.testing.assert_allclose(converted, [5.0, 10.0, 10.0])
+
+
+def test_missing_currency_is_treated_as_eur():
+    matrix = conversion.from_rates({"USD": 2.0})
+    converted = conversion.to_eur(np.array([10.0, 10.0]), pd.Series([np.nan, "USD"]), matrix)
+    np.testing.assert_allclose(converted, [10.0, 5.0])
+    np.testing.assert_allclose(conversion.to_eur(np.array([3.0]), [np.nan], matrix), [3.0])
+
+
+def test_mask_keeps_rows_unchanged():
+    matrix = conversion.from_rates({"USD": 2.0})
+    converted = conversion.to_eur(np.array([10.0, 10.0]), ["USD", "USD"], matrix, mask=[True, False])
+    np.testing.assert_allclose(converted, [5.0, 10.0])
+
+
+def test_empty_input():
+    matrix = conversion.from_rates({"USD": 2.0})
+    assert len(conversion.to_eur(np.array([]), [], matrix)) == 0
+    assert len(conversion.from_eur(pd.Series([], dtype=float), pd.Series([], dtype=str), matrix)) == 0
@@ -0,0 +1,25 @@
+import io
+from sqlalchemy import text
+from utilities import db_operations, importer, storage
+
+
+def test_delta_load_bumps_the_version_only_on_changes(tmp_path):
+    engine = storage.create_database_engine(f"sqlite:///{tmp_path / 'transactions.sqlite'}")
+    storage.create_tables(engine)
+    importer.import_transactions(engine, "delta-owner", io.StringIO(
+        "stock,price_buy,date_buy,quantity_buy,currency\nA,1,2024-01-02,1,EUR\nB,2,2024-01-02,1,EUR\n"), "x.csv")
+    cache = db_operations.TransactionCache("delta-owner")
+    cache.full_load(engine)
+    version = db_operations.data_version("delta-owner")
+
+    # The rows inside the overlap window come back unchanged
+    cache.delta_load(engine)
+    assert db_operations.data_version("delta-owner") == version
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE transactions SET price_buy = 5, updated_at = '2030-01-01 00:00:00' "
+                          "WHERE stock = 'A'"))
+    cache.delta_load(engine)
+    assert db_operations.data_version("delta-owner") != version
+    assert cache.df.loc[cache.df["stock"] == "A", "price_buy"].tolist() == [5.0]
+    assert len(cache.df) == 2
@@ -0,0 +1,168 @@
+import io
+import pandas as pd
+import pytest
+from utilities import importer, storage
+
+
+def export(text):
+    return next(importer.read_chunks(io.StringIO(text), "export.csv"))
+
+
+def test_normalise_maps_broker_headers():
+    rows, reason = importer.normalise(export(
+        "Name,Symbol,Buy Price,Buy Date,Units,CCY\n"
+        "Apple, aapl ,150.5,2024-01-02,3,usd\n"
+    ))
+    assert rows.loc[0, "stock"] == "Apple"
+    assert rows.loc[0, "ticker"] == "AAPL"
+    assert rows.loc[0, "currency"] == "USD"
+    assert rows.loc[0, "date_buy"] == pd.Timestamp("2024-01-02")
+    assert rows.loc[0, "dividends"] == 0.0
+    assert reason.tolist() == [""]
+
+
+def test_normalise_sells_a_sold_lot_in_full_by_default():
+    rows, reason = importer.normalise(export(
+        "stock,price_buy,date_buy,quantity_buy,currency,price_sell,date_sell\n"
+        "A,10,2024-01-02,4,EUR,12,2024-02-01\n"
+    ))
+    assert rows.loc[0, "quantity_sell"] == 4
+    assert reason.tolist() == [""]
+
+
+def test_normalise_rejects_invalid_rows_with_a_reason():
+    rows, reason = importer.normalise(export(
+        "stock,price_buy,date_buy,quantity_buy,currency,price_sell,date_sell\n"
+        ",10,2024-01-02,1,EUR,,\n"
+        "A,10,not a date,1,EUR,,\n"
+        "A,-1,2024-01-02,1,EUR,,\n"
+        "A,10,2024-01-02,0,EUR,,\n"
+        "A,10,2024-01-02,1,EURO,,\n"
+        "A,10,2024-01-02,1,,,\n"
+        "A,10,2024-01-02,1,GBX,,\n"
+        "A,10,2024-01-02,1,EUR,12,yesterday\n"
+        "A,10,2024-01-02,1,EUR,12,2023-12-01\n"
+        "A,10,2024-01-02,1,EUR,,2024-02-01\n"
+        "A,10,2024-01-02,1,EUR,12,\n"
+    ))
+    assert reason.tolist() == [
+        "missing stock",
+        "invalid date_buy",
+        "price_buy must be positive",
+        "quantity_buy must be positive",
+        "invalid currency",
+        "invalid currency",
+        "unsupported currency",
+        "invalid date_sell",
+        "date_sell before date_buy",
+        "missing price_sell",
+        "price_sell without date_sell",
+    ]
+
+
+def test_normalise_day_first_dates():
+    chunk = export("stock,price_buy,date_buy,quantity_buy,currency\nA,1,02/01/2024,1,EUR\n")
+    rows, _ = importer.normalise(chunk, dayfirst=True)
+    assert rows.loc[0, "date_buy"] == pd.Timestamp("2024-01-02")
+
+
+def test_normalise_missing_columns():
+    with pytest.raises(ValueError, match="Missing columns: currency"):
+        importer.normalise(export("stock,price_buy,date_buy,quantity_buy\nA,1,2024-01-02,1\n"))
+
+
+def test_normalise_empty_export():
+    rows, reason = importer.normalise(export("stock,price_buy,date_buy,quantity_buy,currency\n"))
+    assert rows.empty and reason.empty
+
+
+@pytest.mark.parametrize("content", [b"not a workbook", b"", b"PK\x05\x06" + b"\x00" * 18])
+def test_read_chunks_rejects_unreadable_workbooks(content):
+    with pytest.raises(ValueError, match="not a readable XLSX file"):
+        next(importer.read_chunks(io.BytesIO(content), "export.xlsx"))
+
+
+def test_read_chunks_rejects_other_files():
+    with pytest.raises(ValueError, match="Unsupported file type"):
+        next(importer.read_chunks(io.BytesIO(b""), "export.pdf"))
+
+
+def test_keys_match_rows_that_differ_only_by_float_noise():
+    rows, _ = importer.normalise(export(
+        "stock,price_buy,date_buy,quantity_buy,currency\n"
+        "A,10.0000001,2024-01-02,1,EUR\n"
+        "A,10,2024-01-02,1,EUR\n"
+        "A,10,2024-01-03,1,EUR\n"
+    ))
+    keys = importer._keys(rows)
+    hashes, occurrence = keys.get_level_values(0), keys.get_level_values(1)
+    assert hashes[0] == hashes[1] != hashes[2]
+    assert occurrence.tolist() == [0, 1, 0]
+
+
+def test_keys_tell_apart_tickers_and_currencies():
+    rows, _ = importer.normalise(export(
+        "stock,ticker,price_buy,date_buy,quantity_buy,currency\n"
+        "A,A.L,10,2024-01-02,1,GBP\n"
+        "A,A,10,2024-01-02,1,USD\n"
+        "A,A,10,2024-01-02,1,EUR\n"
+    ))
+    assert importer._keys(rows).get_level_values(0).nunique() == 3
+
+
+def test_keys_of_already_deduplicated_rows_are_unique():
+    rows, _ = importer.normalise(export(
+        "stock,price_buy,date_buy,quantity_buy,currency,price_sell,date_sell\n"
+        "A,10,2024-01-02,1,EUR,,\n"
+        "A,10,2024-01-02,1,EUR,11,2024-02-01\n"
+        "B,10,2024-01-02,1,EUR,,\n"
+    ))
+    keys = importer._keys(rows)
+    assert not keys.duplicated().any()
+    assert (keys.get_level_values(1) == 0).all()
+    # The keys of the loaded table match the keys of the same rows in an export
+    table = rows.astype({"stock": "category", "currency": "category", "price_buy": "Float64"})
+    assert keys.isin(importer._keys(table)).all()
+
+
+def test_keys_count_occurrences_across_chunks():
+    chunk = export("stock,price_buy,date_buy,quantity_buy,currency\nA,10,2024-01-02,1,EUR\n")
+    rows, _ = importer.normalise(chunk)
+    first = importer._keys(rows)
+    earlier = first.get_level_values(0).value_counts()
+    assert importer._keys(rows, earlier).get_level_values(1).tolist() == [1]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    url = f"sqlite:///{tmp_path / 'transactions.sqlite'}"
+    engine = storage.create_database_engine(url)
+    storage.create_tables(engine)
+    return engine
+
+
+FILLS = ("stock,ticker,price_buy,date_buy,quantity_buy,currency\n"
+         "A,A,10,2024-01-02,1,EUR\n"
+         "A,A,10,2024-01-02,1,EUR\n"
+         "B,B,20,2024-01-03,2,USD\n")
+
+
+def test_import_keeps_repeated_fills_and_is_idempotent(engine):
+    first = importer.import_transactions(engine, "owner-a", io.StringIO(FILLS), "fills.csv")
+    assert (first.inserted, first.duplicates) == (3, 0)
+    again = importer.import_transactions(engine, "owner-a", io.StringIO(FILLS), "fills.csv")
+    assert (again.inserted, again.duplicates) == (0, 3)
+    # A third identical fill in a later export is new
+    more = importer.import_transactions(engine, "owner-a", io.StringIO(FILLS + "A,A,10,2024-01-02,1,EUR\n"),
+                                        "fills.csv")
+    assert (more.inserted, more.duplicates) == (1, 3)
+    # Another owner's identical rows are not duplicates
+    other = importer.import_transactions(engine, "owner-b", io.StringIO(FILLS), "fills.csv")
+    assert (other.inserted, other.duplicates) == (3, 0)
+
+
+def test_records_use_none_for_missing_values():
+    rows, _ = importer.normalise(export("stock,price_buy,date_buy,quantity_buy,currency\nA,1,2024-01-02,1,EUR\n"))
+    record = importer._records(rows)[0]
+    assert record["date_sell"] is None and record["ticker"] is None
+    assert str(record["date_buy"]) == "2024-01-02"
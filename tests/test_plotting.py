@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+from utilities import plotting
+
+
+def test_lttb_keeps_the_ends_and_the_extremes():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    y[500] = 10.0
+    keep = plotting.lttb(x, y, 100)
+    assert len(keep) == 100
+    assert keep[0] == 0 and keep[-1] == 999
+    assert 500 in keep
+    assert (np.diff(keep) > 0).all()
+
+
+def test_lttb_short_series_and_no_threshold():
+    np.testing.assert_array_equal(plotting.lttb([0, 1, 2], [1, 2, 3], 10), [0, 1, 2])
+    np.testing.assert_array_equal(plotting.lttb(np.arange(5), np.arange(5), None), np.arange(5))
+    assert len(plotting.lttb([], [], 10)) == 0
+
+
+def test_split_at_zero_inserts_the_crossing():
+    x = np.array(["2024-01-01", "2024-01-03"], dtype="datetime64[ns]")
+    xs, positive, negative = plotting.split_at_zero(x, [1.0, -1.0])
+    assert xs[1] == np.datetime64("2024-01-02")
+    np.testing.assert_array_equal(positive, [1.0, 0.0, np.nan])
+    np.testing.assert_array_equal(negative, [np.nan, 0.0, -1.0])
+
+
+def test_split_at_zero_without_crossing_and_empty():
+    x = np.array(["2024-01-01", "2024-01-02"], dtype="datetime64[ns]")
+    xs, positive, negative = plotting.split_at_zero(x, [1.0, 2.0])
+    assert len(xs) == 2
+    assert np.isnan(negative).all()
+    xs, positive, negative = plotting.split_at_zero(np.array([], dtype="datetime64[ns]"), [])
+    assert len(xs) == len(positive) == len(negative) == 0
+
+
+def test_bin_bars_keeps_short_frames():
+    df = pd.DataFrame({"date": pd.date_range("2024-01-01", periods=10, freq="MS"), "amount": 1.0})
+    assert plotting.bin_bars(df, "date", ["amount"]) is df
+
+
+def test_bin_bars_sums_long_frames_per_bucket():
+    df = pd.DataFrame({"date": pd.date_range("2020-01-01", periods=100, freq="W"), "amount": 1.0})
+    binned = plotting.bin_bars(df, "date", ["amount"], max_bars=30)
+    assert len(binned) <= 30
+    assert binned["amount"].sum() == 100
+    assert binned["date"].is_monotonic_increasing
+
+
+def test_bin_bars_ignores_missing_dates():
+    df = pd.DataFrame({"date": [pd.NaT] * 5, "amount": [1.0] * 5})
+    assert plotting.bar_frequency(df["date"]) is None
+    assert plotting.bin_bars(df, "date", ["amount"]) is df
+
+
+def test_axis_range_includes_zero_and_ignores_nan():
+    assert plotting.axis_range([5.0, 10.0, np.nan]) == [0.0, 11.0]
+    low, high = plotting.axis_range([-10.0], [10.0])
+    assert low < -10 and high > 10
+    assert plotting.axis_range([]) == [0.0, 1.0]
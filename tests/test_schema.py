@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+from utilities import schema
+
+
+def raw_transactions():
+    return pd.DataFrame({
+        "id": [3, 1, 2, 4],
+        "stock": ["B", "A", "A", None],
+        "ticker": ["B", "A", "A", None],
+        "currency": ["USD", "EUR", None, "EUR"],
+        "date_buy": ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"],
+        "date_sell": ["2024-03-01", None, "2024-02-01", None],
+        "price_buy": ["1.5", 2, None, 4],
+        "quantity_buy": [1, 2, 3, 4],
+        "price_sell": [2.0, None, 3.0, None],
+        "quantity_sell": [1.0, None, 3.0, None],
+        "dividends": [0.0, 0.0, np.nan, 0.5],
+    })
+
+
+def test_normalise_casts_to_the_canonical_dtypes():
+    df = schema.normalise_transactions(raw_transactions())
+    for column in ["stock", "ticker", "currency"]:
+        assert isinstance(df[column].dtype, pd.CategoricalDtype)
+    for column in schema.DATE_COLUMNS:
+        assert df[column].dtype == "datetime64[ns]"
+    for column in schema.FLOAT_COLUMNS:
+        assert df[column].dtype == "Float64"
+    # Missing values stay missing instead of becoming strings or zeros
+    assert df["currency"].isna().sum() == 1
+    assert df["price_buy"].isna().sum() == 1
+
+
+def test_normalise_orders_by_period_with_open_rows_last():
+    df = schema.normalise_transactions(raw_transactions())
+    assert df["id"].tolist() == [2, 3, 1, 4]
+    assert df.index.tolist() == [0, 1, 2, 3]
+    assert schema.is_period_ordered(df["date_sell"].to_numpy())
+
+
+def test_normalise_empty_frame():
+    df = schema.normalise_transactions(raw_transactions().iloc[:0].copy())
+    assert df.empty
+    assert df["date_sell"].dtype == "datetime64[ns]"
+
+
+def test_normalise_parses_updated_at_as_utc():
+    df = schema.normalise_transactions(pd.DataFrame({"id": [1], "updated_at": ["2024-01-01 10:00:00"]}))
+    assert str(df["updated_at"].dt.tz) == "UTC"
+
+
+def test_is_period_ordered():
+    dates = np.array(["2024-01-01", "2024-01-01", "2024-02-01", "NaT", "NaT"], dtype="datetime64[ns]")
+    assert schema.is_period_ordered(dates)
+    assert not schema.is_period_ordered(dates[[2, 0, 1, 3, 4]])
+    # An open row in the middle breaks the order
+    assert not schema.is_period_ordered(dates[[0, 3, 1, 2, 4]])
+
+
+def test_is_period_ordered_edge_cases():
+    assert schema.is_period_ordered(np.array([], dtype="datetime64[ns]"))
+    assert schema.is_period_ordered(np.array(["NaT", "NaT"], dtype="datetime64[ns]"))
+    assert schema.is_period_ordered(np.array(["2024-01-01"], dtype="datetime64[ns]"))
@@ -1,23 +1,36 @@
 import streamlit as st
 import pandas as pd
-from utilities.db_operations import get_connection, load_data
-from utilities import calculations
+from utilities.db_operations import get_connection, pool_status
+from utilities import calculations, data_context, instrumentation, schema, storage
 
 
-def require_auth(dev_run):
+def require_auth(dev_run, period=None):
+    """
+        Stop at the login form until authenticated, then load the transactions and today's FX rates, or reuse
+        the ones of the session's data context while they are fresh.
+
+        Pages filtering by period pass it, so that a very large table is only read for that period.
+    """
     if not st.session_state.get("authenticated", False):
         show_login()
         st.stop()
-    if not dev_run:
-        engine = get_connection()
-        df = load_data(engine)
-    else:
-        df = pd.read_csv(r"C:\Users\gianm\OneDrive\Desktop\finances_db_test")
+    if dev_run:
+        # Local SQLite database seeded from a production snapshot, see utilities/storage.py
+        storage.use_dev_database()
+    # Built once per session: reruns reuse the frame and the rates until they are stale
+    context = st.session_state.get("data_context")
+    if context is None:
+        context = st.session_state["data_context"] = data_context.DataContext()
+    try:
+        context.refresh(get_connection(), current_owner(), calculations.period_start(period))
+    except LookupError as e:
+        st.error(f"Exchange rates are unavailable, try again later. {e}")
+        st.stop()
 
-    st.session_state["df"] = df
-    usd, pln = calculations.today_rate()
-    st.session_state["usd"] = usd
-    st.session_state["pln"] = pln
+    st.session_state["df"] = context.df
+    st.session_state["rates"] = context.rates
+    st.session_state["usd"] = context.rates["USD"]
+    st.session_state["pln"] = context.rates["PLN"]
 
 
 def show_login():
@@ -35,6 +48,39 @@ def show_login():
                 allowed_users = st.secrets["users"]
                 if username in allowed_users and password == allowed_users[username]["password"]:
                     st.session_state.authenticated = True
+                    st.session_state.username = username
                     st.rerun()
                 else:
                     st.error("Invalid username or password")
+
+
+def current_owner():
+    """Owner of the logged-in user's transactions: "owner" of the user in secrets.toml, else the username"""
+    username = st.session_state.get("username")
+    return st.secrets["users"][username].get("owner", username)
+
+
+def is_admin():
+    username = st.session_state.get("username")
+    users = st.secrets.get("users", {})
+    return bool(username in users and users[username].get("admin", False))
+
+
+def performance_panel():
+    """Close the current render's timings and, for admins, show them below the page"""
+    summary = instrumentation.end_render()
+    if summary is None or not is_admin():
+        return
+    marginl, center, marginr = st.columns([1, 8, 1])
+    with center:
+        with st.expander(f"⏱️ Performance: {summary['total_ms']:.0f} ms", expanded=False):
+            if summary["functions"]:
+                timings = pd.DataFrame.from_dict(summary["functions"], orient="index").sort_values("ms", ascending=False)
+                st.dataframe(timings, column_config={"ms": st.column_config.NumberColumn("ms", format="%.1f")})
+            df = st.session_state.get("df")
+            if df is not None:
+                memory = schema.memory_report(df)
+                st.caption(f"Transactions frame: {len(df)} rows, {memory.loc['total', 'kb']:.0f} KB")
+                st.dataframe(memory, column_config={"kb": st.column_config.NumberColumn("KB", format="%.1f")})
+            if "db_connection" in st.secrets:
+                st.caption("DB pool: " + ", ".join(f"{k} {v}" for k, v in pool_status().items()))
@@ -0,0 +1,63 @@
+import functools
+import threading
+import time
+import streamlit as st
+from utilities import instrumentation
+
+# What a cached entry depends on; writes invalidate only the matching tags
+TRANSACTIONS = "transactions"
+PRICES = "prices"
+FX = "fx"
+NEWS = "news"
+ALL_TAGS = (TRANSACTIONS, PRICES, FX, NEWS)
+
+_registry = {}
+_lock = threading.Lock()
+
+
+def register(clear, *tags):
+    """Call clear() whenever one of the tags is invalidated"""
+    with _lock:
+        for tag in tags:
+            _registry.setdefault(tag, []).append(clear)
+
+
+def cached(*tags, **cache_kwargs):
+    """
+        st.cache_data with tags: invalidating one of the tags clears the function.
+
+        Every call is recorded in the current render with its time and whether it was a cache hit.
+    """
+    def decorator(fn):
+        label = f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+        miss = threading.local()
+
+        @functools.wraps(fn)
+        def compute(*args, **kwargs):
+            # Only runs when Streamlit has no cached value
+            miss.flag = True
+            return fn(*args, **kwargs)
+
+        cached_fn = st.cache_data(**cache_kwargs)(compute)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            miss.flag = False
+            start = time.perf_counter()
+            result = cached_fn(*args, **kwargs)
+            instrumentation.record(label, time.perf_counter() - start, instrumentation.rows_of(result),
+                                   hit=not miss.flag)
+            return result
+
+        wrapper.clear = cached_fn.clear
+        register(cached_fn.clear, *tags)
+        return wrapper
+    return decorator
+
+
+def invalidate(*tags):
+    """Clear only the caches depending on the given tags"""
+    with _lock:
+        clears = [clear for tag in tags for clear in _registry.get(tag, [])]
+    for clear in dict.fromkeys(clears):
+        clear()
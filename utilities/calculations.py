@@ -1,105 +1,104 @@
+import numpy as np
 import pandas as pd
 import streamlit as st
-import requests
-import json
 import datetime
-import yfinance as yf
-from utilities import db_operations
+from utilities import cache, conversion, db_operations, fx_store, importer, instrumentation, quotes, schema
 from utilities.db_operations import clear_cache
 
 
+PERIODS = ["1M", "3M", "6M", "YTD", "1Y", "∞"]
+DEFAULT_PERIOD = "1Y"
+
+
+def period_start(period, today=None):
+    """First day of a period of the segmented control, None for all history"""
+    today = today or datetime.date.today()
+    if period == "1M":
+        return today - datetime.timedelta(days=30)
+    elif period == "3M":
+        return today - datetime.timedelta(days=90)
+    elif period == "6M":
+        return today - datetime.timedelta(days=180)
+    elif period == "YTD":
+        return datetime.date(today.year, 1, 1)
+    elif period == "1Y":
+        return today - datetime.timedelta(days=365)
+    return None
+
+
+@instrumentation.timed()
 def find_start(df, start):
-    today = datetime.date.today()
-    df["date_sell"] = pd.to_datetime(df["date_sell"]).dt.date
-    if start == "1M":
-        range_start = today - datetime.timedelta(days=30)
-    elif start == "3M":
-        range_start = today - datetime.timedelta(days=90)
-    elif start == "6M":
-        range_start = today - datetime.timedelta(days=180)
-    elif start == "YTD":
-        range_start = datetime.date(today.year, 1, 1)
-    elif start == "1Y":
-        range_start = today - datetime.timedelta(days=365)
-    elif start == "∞":
-        return df
+    """
+        Rows sold since the start of the period, plus all open ones, without copying or changing df.
 
-    return df[
-        (df["date_sell"] >= range_start) |
-        (df["date_sell"].isna())
-        ]
+        Loaded frames are ordered by date_sell with open rows last, so the period is the tail from one
+        binary search; any other frame is ordered first.
+    """
+    range_start = period_start(start)
+    if range_start is None:
+        return df
+    sell = df["date_sell"].to_numpy(dtype="datetime64[ns]")
+    if not schema.is_period_ordered(sell):
+        df = schema.order_by_period(df)
+        sell = df["date_sell"].to_numpy(dtype="datetime64[ns]")
+    # NaT sorts after every date, so open rows always fall inside the tail
+    first = np.searchsorted(sell, np.datetime64(range_start, "ns"), side="left")
+    return df.iloc[first:]
 
 
-@st.cache_data(ttl=600)  # Cache for 10 minute
+@instrumentation.timed()
 def get_current_prices(df_filtered):
-    """Get current prices with caching"""
+    """Mark open positions to market with the shared per-ticker quote cache"""
     if df_filtered.empty:
         return df_filtered
     return api_current_price(df_filtered.copy())
 
 
-def find_capital(df, usd, pln):
+@instrumentation.timed()
+def capital_curve(df, rates):
+    """
+        Capital pulled into the portfolio over time, from the signed cash-flow ledger of all buys and sells.
+
+        The capital needed up to a date is the deepest running deficit of the cumulative cash flow.
+    """
+    n = len(df)
+    buy_dates = df["date_buy"].to_numpy(dtype="datetime64[ns]")
+    sell_dates = df["date_sell"].to_numpy(dtype="datetime64[ns]")
+    buys = np.abs(df["price_buy"].to_numpy(dtype=float) * df["quantity_buy"].to_numpy(dtype=float))
+    # Positions without a sell price (e.g. open ones marked at today) bring no proceeds
+    sells = np.nan_to_num(np.abs((df["price_sell"] * df["quantity_sell"] + df["dividends"]).to_numpy(dtype=float)))
+
+    # Interleave the buy and sell of each row so that same-day events keep the row order
+    dates = np.column_stack([buy_dates, sell_dates]).ravel()
+    flows = np.column_stack([-buys, sells]).ravel()
+    currencies = np.repeat(df["currency"].to_numpy(dtype=object), 2)
+    events = np.column_stack([np.ones(n, dtype=bool), ~np.isnat(sell_dates)]).ravel()
+
+    dates, flows, currencies = dates[events], flows[events], currencies[events]
+    flows = conversion.to_eur(flows, currencies, conversion.from_rates(rates))
+    order = np.argsort(dates, kind="stable")
+    cash = np.cumsum(flows[order])
+    capital = np.maximum.accumulate(np.maximum(-cash, 0)) if len(cash) else cash
+
+    return pd.DataFrame({"date": dates[order], "cash_flow": flows[order], "capital": capital})
+
+
+def find_capital(df, rates):
     """
         Calculate the capital pulled into the portfolio, accounting for transaction timing.
 
         Capital must be pulled if a buy occurs before sufficient sell proceeds are available.
     """
-    capital = 0
-    available_cash = 0
-
-    # Create a timeline of all buy and sell events
-    events = []
-
-    for idx, row in df.iterrows():
-        # Add buy event
-        events.append({
-            'date': row['date_buy'],
-            'type': 'buy',
-            'amount': abs(row["price_buy"] * row["quantity_buy"]),
-            'currency': row['currency']
-        })
-
-        # Add sell event if position is closed
-        if pd.notna(row['date_sell']):
-            events.append({
-                'date': row['date_sell'],
-                'type': 'sell',
-                'amount': abs(row["price_sell"] * row["quantity_sell"] + row["dividends"]),
-                'currency': row['currency']
-            })
-
-        # Sort all events chronologically
-    events_sorted = sorted(events, key=lambda x: x['date'])
-
-    # Process events in chronological order
-    for event in events_sorted:
-        if event['currency'] == 'USD':
-            event['amount'] /= usd
-        elif event['currency'] == 'PLN':
-            event['amount'] /= pln
-
-        if event['type'] == 'buy':
-            # Check if we have enough cash from previous sells
-            if available_cash < event['amount']:
-                # Need to pull new capital
-                capital += event['amount'] - available_cash
-                available_cash = 0
-            else:
-                # Can cover with existing cash
-                available_cash -= event['amount']
-
-        elif event['type'] == 'sell':
-            # Add proceeds to available cash
-            available_cash += event['amount']
-
-    return round(capital)
+    curve = capital_curve(df, rates)
+    return round(float(curve["capital"].iloc[-1])) if not curve.empty else 0
 
 
+@instrumentation.timed()
 def create_daily_cumulative(df):
     """Create daily cumulative data"""
-    daily = df.groupby(["owner", "date_sell"])["earning"].sum().reset_index()
+    daily = df.groupby(["owner", "date_sell"], observed=True)["earning"].sum().reset_index()
     daily = daily.sort_values(["owner", "date_sell"])
-    daily["cumulative"] = daily.groupby("owner")["earning"].cumsum()
+    daily["cumulative"] = daily.groupby("owner", observed=True)["earning"].cumsum()
     return daily
 
 
@@ -111,94 +110,24 @@ def api_current_price(df):
     open_tickers = df.loc[open_mask, "ticker"].unique()
 
     if len(open_tickers) == 0:
+        df["is_open"] = False
         return df
 
-    try:
-        # Single API call to fetch all current prices
-        current_prices = yf.download(
-            tickers=list(open_tickers),
-            period="1d",
-            group_by="ticker",
-            auto_adjust=True,
-            prepost=True,
-            threads=True,
-            progress=False  # Suppress progress bar
-        )
-
-        # Extract the most recent close price for each ticker
-        ticker_prices = {}
-
-        if len(open_tickers) == 1:
-            # Single ticker case - data structure is different
-            ticker = open_tickers[0]
-            # Check if we have any data and a Close column
-            if not current_prices.empty:
-                if "Close" in current_prices.columns:
-                    # Flat structure: columns are ['Close', 'Open', etc.]
-                    ticker_prices[ticker] = current_prices["Close"].iloc[-1]
-                elif isinstance(current_prices.columns, pd.MultiIndex):
-                    # Sometimes even single ticker returns MultiIndex
-                    ticker_prices[ticker] = current_prices[ticker]["Close"].iloc[-1]
-        else:
-            # Multiple tickers case
-            for ticker in open_tickers:
-                try:
-                    if ticker in current_prices.columns.get_level_values(0):
-                        close_data = current_prices[ticker]["Close"]
-                        if not close_data.empty:
-                            ticker_prices[ticker] = close_data.iloc[-1]
-                except (KeyError, IndexError):
-                    print(f"Could not extract price for {ticker}")
-                    continue
-
-        # Update dataframe with fetched prices - VECTORIZED
-        today = datetime.date.today()
-
-        for ticker, current_price in ticker_prices.items():
-            stock_mask = (df["ticker"] == ticker) & open_mask
-
-            # Vectorized operations - no loops
-            df.loc[stock_mask, "total_sell"] = current_price * df.loc[stock_mask, "quantity_buy"]
-            df.loc[stock_mask, "earning"] = round(df.loc[stock_mask, "total_sell"] - df.loc[stock_mask, "total_buy"], 2)
-            df.loc[stock_mask, "date_sell"] = today
-
-        # Create mask for rows that were successfully updated
-        updated_mask = df["ticker"].isin(ticker_prices.keys()) & (df["date_sell"] == today)
-
-        if updated_mask.any():
-            # Convert all earnings to EUR at once (only for updated rows)
-            df.loc[updated_mask, "earning"] = df.loc[updated_mask].apply(
-                lambda row: convert_to_eur(row, "earning", "date_sell"), axis=1
-            )
-
-            # Set date_sell to "OPEN" for all updated rows
-            df.loc[updated_mask, "date_sell"] = "OPEN"
-
-    except Exception as e:
-        print(f"Bulk fetch failed: {e}")
-        # Fallback to original method if bulk fetch fails
-        today = datetime.date.today()
-
-        for ticker in open_tickers:
-            try:
-                current_price = yf.Ticker(ticker).history(period="1d")["Close"].iloc[-1]
-                stock_mask = (df["ticker"] == ticker) & open_mask
-
-                df.loc[stock_mask, "total_sell"] = current_price * df.loc[stock_mask, "quantity_buy"]
-                df.loc[stock_mask, "earning"] = round(
-                    df.loc[stock_mask, "total_sell"] - df.loc[stock_mask, "total_buy"], 2)
-                df.loc[stock_mask, "date_sell"] = today
-            except Exception as ticker_error:
-                print(f"Failed to fetch {ticker}: {ticker_error}")
-                pass
-
-        # Convert all earnings to EUR at once in fallback too
-        updated_mask = df["date_sell"] == today
-        if updated_mask.any():
-            df.loc[updated_mask, "earning"] = df.loc[updated_mask].apply(
-                lambda row: convert_to_eur(row, "earning", "date_sell"), axis=1
-            )
-            df.loc[updated_mask, "date_sell"] = "OPEN"
+    ticker_prices = quotes.get_prices(open_tickers)
+    current_price = df["ticker"].map(ticker_prices).astype(float)
+    updated_mask = open_mask & current_price.notna()
+
+    # Priced open positions keep date_sell empty (NaT) and are flagged instead
+    df["is_open"] = updated_mask
+    if updated_mask.any():
+        today = pd.Timestamp(datetime.date.today())
+        df.loc[updated_mask, "total_sell"] = current_price[updated_mask] * df.loc[updated_mask, "quantity_buy"]
+        df.loc[updated_mask, "earning"] = round(
+            df.loc[updated_mask, "total_sell"] - df.loc[updated_mask, "total_buy"], 2)
+
+        # Convert all earnings to EUR at once (only for updated rows), at today's rates
+        df.loc[updated_mask, "earning"] = convert_to_eur(
+            df.loc[updated_mask].assign(date_sell=today), "earning", "date_sell")
 
     return df
 
@@ -225,40 +154,29 @@ def create_card(title, value, curr):
     return card
 
 
-def api_request_fx(currency, transaction_date) -> float:
-    try:
-        url = f'https://api.frankfurter.dev/v1/{transaction_date}?symbols={currency}'
-        r = requests.get(url)
-        parsed = json.loads(r.text)
-        response = parsed['rates']
-        fx_rate = list(response.values())[0]
-        return fx_rate
-    except Exception as e:
-        print(f'Error fetching exchange rate: {str(e)}')
+@instrumentation.timed()
+def convert_to_eur(df, price, date):
+    """Convert a column to EUR at the rate of each row's date, with a single lookup in the FX store"""
+    dates = df[date]
+    rates = fx_store.get_rates(df["currency"].unique(), dates.min().date(), dates.max().date())
+    matrix = conversion.from_frame(rates)
+    return conversion.to_eur(df[price], df["currency"], matrix, dates).round(2)
 
 
-def convert_to_eur(row, price, date):
-    if row["currency"] != "EUR" and not pd.isna(row[date]):
-        row[date] = datetime.date.today()
-        return round(row[price] / api_request_fx(row["currency"], row[date]), 2)
-    return round(row[price], 2)
-
-
-def convert_open_to_eur(row, price, date, usd_rate, pln_rate):
-    if row["currency"] == "USD" and not pd.isna(row[date]):
-        return round(row[price] / usd_rate, 2)
-    elif row["currency"] == "PLN" and not pd.isna(row[date]):
-        return round(row[price] / pln_rate, 2)
-    return round(row[price], 2)
+@instrumentation.timed()
+def today_rates(currencies=("USD", "PLN"), required=None):
+    """Return today's {currency: rate} for every currency in use; see fx_store.rates_on for required"""
+    rates = fx_store.rates_on(currencies, datetime.date.today(), required)
+    return {currency: round(rate, 2) for currency, rate in rates.items()}
 
 
 def today_rate():
-    usd_rate = round(api_request_fx("USD", datetime.date.today()), 2)
-    pln_rate = round(api_request_fx("PLN", datetime.date.today()), 2)
-    return usd_rate, pln_rate
+    rates = today_rates(["USD", "PLN"])
+    return rates["USD"], rates["PLN"]
 
 
-def calculate_metrics(df, usd_rate, pln_rate, include_dividends=True):
+@instrumentation.timed()
+def calculate_metrics(df, rates, include_dividends=True):
     """Calculate derived columns with caching"""
     df = df.copy()
     # Add calculation columns
@@ -268,68 +186,44 @@ def calculate_metrics(df, usd_rate, pln_rate, include_dividends=True):
         df["total_sell"] = df["price_sell"] * df["quantity_sell"]
     df["earning"] = df["total_sell"] - df["total_buy"]
 
-    df["earning"] = df.apply(lambda row: convert_open_to_eur(row, "earning", "date_sell", usd_rate, pln_rate), axis=1)
+    # Closed positions are converted at today's rates; open ones are converted once priced
+    matrix = conversion.from_rates(rates)
+    df["earning"] = conversion.to_eur(df["earning"], df["currency"], matrix, mask=df["date_sell"].notna()).round(2)
     return df
 
 
-@st.cache_data
+@cache.cached(cache.TRANSACTIONS)
 def calculate_owner_stats(df):
-    """Calculate statistics for each owner"""
-    stats = {}
-
-    for owner in df["owner"].unique():
-        owner_df = df[df["owner"] == owner].copy()
-
-        # Closed positions only for most metrics
-        closed_df = owner_df[owner_df["date_sell"].notna()]
-        open_df = owner_df[owner_df["date_sell"].isna()]
-
-        # Total earnings (closed positions)
-        total_earnings = closed_df["earning"].sum() if not closed_df.empty else 0
-        st.session_state["total_earnings"] = total_earnings
-
-        # Average position holding time (closed positions only)
-        if not closed_df.empty:
-            closed_df["date_buy"] = pd.to_datetime(closed_df["date_buy"])
-            closed_df["date_sell"] = pd.to_datetime(closed_df["date_sell"])
-            closed_df["holding_days"] = (closed_df["date_sell"] - closed_df["date_buy"]).dt.days
-            avg_holding_days = closed_df["holding_days"].mean()
-        else:
-            avg_holding_days = 0
-
-        # Number of transactions
-        total_transactions = len(closed_df)
-        open_positions = len(open_df)
-
-        # Win rate
-        winning_trades = len(closed_df[closed_df["earning"] > 0])
-        win_rate = (winning_trades / total_transactions * 100) if total_transactions > 0 else 0
-
-        # Best and worst trade
-        best_trade = closed_df["earning"].max() if not closed_df.empty else 0
-        worst_trade = closed_df["earning"].min() if not closed_df.empty else 0
-
-        stats[owner] = {
-            "total_earnings": total_earnings,
-            "avg_holding_days": avg_holding_days,
-            "total_transactions": total_transactions,
-            "open_positions": open_positions,
-            "win_rate": win_rate,
-            "best_trade": best_trade,
-            "worst_trade": worst_trade,
-        }
-
-    return stats
-
-
-@st.cache_data(ttl=3600)
-def get_one_news(ticker, index=0):
-    news = yf.Ticker(ticker).news
-    return news[index] if news and len(news) > index else None
+    """Calculate statistics for each owner in one groupby pass, one row per owner"""
+    closed = df["date_sell"].notna()
+    holding_days = (df["date_sell"] - df["date_buy"]).dt.days
+    ledger = pd.DataFrame({
+        "owner": df["owner"],
+        "closed": closed,
+        "open": ~closed,
+        "closed_earning": df["earning"].where(closed),
+        "holding_days": holding_days.where(closed),
+        "win": closed & (df["earning"] > 0),
+    })
+
+    stats = ledger.groupby("owner", sort=False, observed=True).agg(
+        total_earnings=("closed_earning", "sum"),
+        avg_holding_days=("holding_days", "mean"),
+        total_transactions=("closed", "sum"),
+        open_positions=("open", "sum"),
+        winning_trades=("win", "sum"),
+        best_trade=("closed_earning", "max"),
+        worst_trade=("closed_earning", "min"),
+    )
+    stats["win_rate"] = (stats["winning_trades"] / stats["total_transactions"] * 100).where(
+        stats["total_transactions"] > 0, 0)
+
+    return stats[["total_earnings", "avg_holding_days", "total_transactions", "open_positions",
+                  "win_rate", "best_trade", "worst_trade"]].fillna(0)
 
 
 @st.dialog("Add transaction")
-def add_transaction_dialog(typ, df, today):
+def add_transaction_dialog(typ, df, today, owner):
     if typ == "A":
         # Initialize session state for sold checkbox if not exists
         if 'sold_checkbox' not in st.session_state:
@@ -361,9 +255,9 @@ def add_transaction_dialog(typ, df, today):
 
             if st.form_submit_button("Submit"):
                 engine = db_operations.get_connection()
-                db_operations.new_stock_to_db(engine, stock, price_buy, date_buy, quantity_buy,
+                db_operations.new_stock_to_db(engine, owner, stock, price_buy, date_buy, quantity_buy,
                                               price_sell, date_sell, quantity_sell, currency, ticker, dividends)
-                clear_cache()  # Clear cache after adding new data
+                clear_cache(owner)  # Clear cache after adding new data
                 st.success("Transaction added successfully!")
                 # Reset the checkbox after successful submission
                 st.session_state.sold_checkbox = False
@@ -374,7 +268,7 @@ def add_transaction_dialog(typ, df, today):
 
         if action == "Close transaction":
             # Filter open positions for that owner
-            open_stocks = df[(df["owner"] == "Gim") & (df["date_sell"].isna())]
+            open_stocks = df[(df["owner"] == owner) & (df["date_sell"].isna())]
 
             if not open_stocks.empty:
                 with st.form("form_b"):
@@ -389,13 +283,13 @@ def add_transaction_dialog(typ, df, today):
 
                     if st.form_submit_button("Submit"):
                         engine = db_operations.get_connection()
-                        db_operations.close_stock(engine, selected_stock, price_sell, date_sell,
+                        db_operations.close_stock(engine, owner, selected_stock, price_sell, date_sell,
                                                   quantity_sell, dividends)
-                        clear_cache()  # Clear cache after closing position
+                        clear_cache(owner)  # Clear cache after closing position
                         st.success("Position closed successfully!")
         else:
             # Filter open positions for that owner
-            open_stocks = df[(df["owner"] == "Gim") & (df["date_sell"].isna())]
+            open_stocks = df[(df["owner"] == owner) & (df["date_sell"].isna())]
             if not open_stocks.empty:
                 with st.form("form_b"):
                     # Create selectbox of stock names
@@ -405,5 +299,31 @@ def add_transaction_dialog(typ, df, today):
 
                     if st.form_submit_button("Submit"):
                         engine = db_operations.get_connection()
-                        db_operations.add_etf(engine, selected_stock, new_price, new_qty)
-                        clear_cache()  # Clear cache after closing position
+                        db_operations.add_etf(engine, owner, selected_stock, new_price, new_qty)
+                        clear_cache(owner)  # Clear cache after closing position
+
+
+@st.dialog("Import transactions")
+def import_dialog(owner):
+    st.caption("CSV or XLSX export, one row per lot, with columns stock, ticker, price_buy, date_buy, quantity_buy, "
+               "currency and, for sold lots, price_sell, date_sell, quantity_sell and dividends.")
+    uploaded = st.file_uploader("Broker export", type=["csv", "xlsx"])
+    dayfirst = st.toggle("Dates are day first (31/12/2024)", value=True)
+
+    if uploaded is not None and st.button("Import", width='stretch'):
+        from sqlalchemy.exc import SQLAlchemyError
+        engine = db_operations.get_connection()
+        try:
+            result = importer.import_transactions(engine, owner, uploaded, uploaded.name, dayfirst)
+        except ValueError as e:
+            st.error(f"Could not import {uploaded.name}: {e}")
+            return
+        except SQLAlchemyError as e:
+            # The import runs in one database transaction: nothing was inserted
+            print(f"Import of {uploaded.name} failed: {e}")
+            st.error(f"Could not save {uploaded.name}, nothing was imported. Try again later.")
+            return
+        st.success(f"Imported {result.inserted} transactions, skipped {result.duplicates} duplicates.")
+        if not result.rejected.empty:
+            st.warning(f"{len(result.rejected)} rows were rejected.")
+            st.dataframe(result.rejected, hide_index=True)
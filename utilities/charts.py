@@ -0,0 +1,328 @@
+import datetime
+from collections import namedtuple
+import numpy as np
+import plotly.graph_objects as go
+from plotly.colors import qualitative
+from utilities import cache, instrumentation, plotting
+
+# Points sent to the browser for the portfolio line, whatever the length of the history
+PORTFOLIO_MAX_POINTS = 1500
+# Open positions in the daily P/L are marked at live quotes, which refresh every 10 minutes
+CALENDAR_TTL_SECONDS = 600
+
+# values[y, w, d] is the P/L of weekday d (0=Mon) of ISO week w + 1 of years[y]
+CalendarGrid = namedtuple("CalendarGrid", ["years", "values"])
+
+
+@instrumentation.timed()
+def modern_portfolio_chart(df, max_points=PORTFOLIO_MAX_POINTS):
+    """
+    Modern, clean portfolio line chart with positive/negative areas.
+
+    Long histories are downsampled with LTTB to max_points (None keeps every point), and each sign is
+    drawn as a single trace broken by NaN, so the figure size does not grow with the history.
+    """
+    x_values = df.index.to_numpy(dtype="datetime64[ns]")
+    y_values = df.iloc[:, 0].to_numpy(dtype=float)
+    keep = plotting.lttb(x_values.astype(np.int64), y_values, max_points)
+    x_values, positive, negative = plotting.split_at_zero(x_values[keep], y_values[keep])
+
+    fig = go.Figure()
+
+    for y, color, fillcolor in ((positive, "#22c55e", "rgba(34,197,94,0.12)"),
+                                (negative, "#ef4444", "rgba(239,68,68,0.12)")):
+        fig.add_trace(go.Scatter(
+            x=x_values,
+            y=y,
+            mode="lines",
+            line=dict(color=color, width=3, shape="spline"),
+            fill="tozeroy",
+            fillcolor=fillcolor,
+            hovertemplate="<b>%{x|%d %b %Y}</b><br>€ %{y:,.2f}<extra></extra>",
+            showlegend=False
+        ))
+
+    # --- Layout: slick, clean, tech ---
+    fig.update_layout(
+        height=360,
+        margin=dict(l=0, r=0, t=0, b=20),
+        hovermode="x unified",
+
+        xaxis=dict(
+            showgrid=False,
+            zeroline=False,
+            tickformat="%b %Y",
+            ticks="outside",
+            ticklen=6
+        ),
+
+        yaxis=dict(
+            showgrid=True,
+            gridcolor="rgba(255,255,255,0.05)",
+            zeroline=True,
+            zerolinecolor="rgba(255,255,255,0.25)",
+            zerolinewidth=1,
+            tickformat=".,0f"
+        ),
+    )
+
+    return fig
+
+
+def create_unique_labels(stocks_df):
+    """
+    Create unique labels for stocks that might have duplicates
+    """
+    unique_labels = []
+    label_counts = {}
+
+    for _, row in stocks_df.iterrows():
+        base_label = row['stock'][:8]
+
+        # Keep track of how many times we've seen this label
+        if base_label in label_counts:
+            label_counts[base_label] += 1
+            # Add a counter to make it unique
+            unique_label = f"{base_label}({label_counts[base_label]})"
+        else:
+            label_counts[base_label] = 1
+            unique_label = base_label
+
+        unique_labels.append(unique_label)
+
+    return unique_labels
+
+
+@instrumentation.timed()
+def top_worst_graph(is_top, stocks, color, graph_title):
+    if is_top:
+        max_value = stocks["earning"].max()
+        if max_value > 0:
+            graph_range = [0, max_value * 1.2]
+        else:
+            max_value = stocks["earning"].min()
+            color = "#ef4444"
+            graph_range = [0, max_value * 1.2]
+    else:
+        max_value = stocks["earning"].min()
+        if max_value < 0:
+            graph_range = [max_value * 1.2, 0]
+        else:
+            max_value = stocks["earning"].max()
+            color = '#10b981'
+            graph_range = [0, max_value * 1.2]
+
+    fig = go.Figure()
+
+    if len(stocks) != 0:
+        unique_labels = create_unique_labels(stocks)
+    else:
+        unique_labels = ['']
+    if len(stocks) == 3:
+        width = 0.4
+    elif len(stocks) == 2:
+        width = 0.3
+    else:
+        width = 0.15
+
+    # Add bar trace with modern styling
+    fig.add_trace(go.Bar(
+        x=unique_labels,
+        y=stocks['earning'],
+        # Modern color scheme
+        marker=dict(
+            color=color,  # Modern indigo color
+            line=dict(width=0),  # Remove border
+            # This creates rounded corners - adjust the radius as needed
+            cornerradius=8
+        ),
+        texttemplate="%{y:.0f}",  # ← integer display
+        text=stocks['earning'],
+        textposition='outside',  # Position text outside/above the bars
+        # Make bars thinner
+        width=width,  # Adjust this value (0.1 to 1.0) to control bar thickness
+        textfont=dict(color='white', size=12, family='Arial')
+    ))
+
+    # Update layout for modern appearance
+    fig.update_layout(
+        title=dict(
+            text=graph_title,
+            x=0.225,  # Center the title
+            font=dict(size=15, family='Arial', color='#b8b6b6')
+        ),
+        xaxis=dict(
+            showgrid=False,
+            zeroline=False
+        ),
+        yaxis=dict(
+            showgrid=False,
+            showticklabels=False,  # Hide Y-axis scale numbers
+            range=[graph_range[0], graph_range[1]],
+            visible=False  # Completely hide Y-axis
+        ),
+        plot_bgcolor='#1E1E1E',
+        paper_bgcolor='#1E1E1E',
+        font=dict(family='Arial', color='#1f2937'),
+        margin=dict(l=30, r=30, t=50, b=60),
+        height=280,
+        width=280,
+        showlegend=False
+    )
+    return fig
+
+
+@instrumentation.timed()
+def ring_chart(closed_transactions):
+    # Group by stock and sum all earnings (so multiple trades are combined)
+    stock_summary = (
+        closed_transactions
+        .groupby('stock', as_index=False, observed=True)['earning']
+        .sum()
+    )
+
+    top_4 = stock_summary.nlargest(4, 'earning')
+    # Sum of the rest (not in top 4)
+    others_sum = stock_summary[~stock_summary['stock'].isin(top_4['stock'])]['earning'].sum()
+
+    labels = list(top_4['stock'])
+    values = list(top_4['earning'])
+
+    if others_sum > 0:
+        labels.append("Others")
+        values.append(others_sum)
+
+    colors = qualitative.Safe[:len(labels)]
+
+    # Create donut chart with modern styling
+    fig = go.Figure(data=[go.Pie(
+        labels=labels,
+        values=values,
+        hole=0.8,
+        textinfo='label+percent',
+        textposition='outside',
+        marker=dict(
+            colors=colors,
+            line=dict(color='#1e1e1e', width=3)  # Add gap between slices
+        ),
+        pull=[0.02] * len(labels),  # Slight pull creates separation
+        rotation=45  # Rotate for better visual balance
+    )])
+
+    fig.update_layout(
+        title=dict(
+            text="Most profitable stocks",
+            x=0.16,
+            font=dict(size=15, family='Arial', color='#b8b6b6')
+        ),
+        height=310,
+        showlegend=False,
+        paper_bgcolor='#1e1e1e',  # Match background
+        plot_bgcolor='#1e1e1e'
+    )
+
+    return fig
+
+
+@cache.cached(cache.TRANSACTIONS, cache.PRICES, ttl=CALENDAR_TTL_SECONDS, max_entries=32)
+def calendar_grid(_daily, key):
+    """
+        Daily P/L summed into a dense (year, ISO week, weekday) grid, Monday to Friday.
+
+        key identifies the data behind daily (owner, data version and page filters); the grid is only rebuilt
+        when it changes. Days without any sale are NaN.
+    """
+    dates = _daily["date_sell"]
+    closed = dates.notna().to_numpy()
+    iso = dates[closed].dt.isocalendar()
+    year = iso["year"].to_numpy(dtype=np.int64)
+    week = iso["week"].to_numpy(dtype=np.intp) - 1
+    dow = iso["day"].to_numpy(dtype=np.intp) - 1
+    earning = _daily["earning"].to_numpy(dtype=float)[closed]
+
+    weekday = dow < 5
+    years, year_index = np.unique(year[weekday], return_inverse=True)
+    cell = (year_index, week[weekday], dow[weekday])
+    values = np.zeros((len(years), 53, 5))
+    counts = np.zeros((len(years), 53, 5), dtype=np.int64)
+    np.add.at(values, cell, np.nan_to_num(earning[weekday]))
+    np.add.at(counts, cell, 1)
+    values[counts == 0] = np.nan
+    return CalendarGrid(years.tolist(), values)
+
+
+@instrumentation.timed()
+def heatmap(grid, year=None):
+    """Weekday by week heatmap of one year of a calendar_grid, the latest by default"""
+    if not grid.years:
+        calendar = np.full((5, 52), np.nan)
+    else:
+        year = year if year in grid.years else grid.years[-1]
+        weeks = datetime.date(year, 12, 28).isocalendar()[1]  # 52 or 53 ISO weeks
+        calendar = grid.values[grid.years.index(year), :weeks].T
+
+    # Get actual min and max values
+    min_val = np.nanmin(calendar) if not np.isnan(calendar).all() else 0
+    max_val = np.nanmax(calendar) if not np.isnan(calendar).all() else 0
+
+    # Calculate the position of zero in the scale (0 to 1)
+    total_range = max_val - min_val
+    zero_position = (0 - min_val) / total_range if total_range > 0 else 0.5
+
+    fig = go.Figure(
+        go.Heatmap(
+            z=calendar,
+            x=[f"W{w}" for w in range(1, calendar.shape[1] + 1)],
+            y=["Mon", "Tue", "Wed", "Thu", "Fri"],
+            colorscale=[
+                [0.0, "#ef4444"],  # Deep red at min_val
+                [zero_position * 0.5, "#882020"],  # Mid-dark red
+                [zero_position * 0.9, "#241919"],  # Dark red approaching zero
+                [max(0, zero_position - 0.01), "#1E1E1E"],  # Background just before zero
+                [zero_position, "#1E1E1E"],  # Background at zero
+                [min(1, zero_position + 0.01), "#1E1E1E"],  # Background just after zero
+                [zero_position + (1 - zero_position) * 0.1, "#19241a"],  # Dark green leaving zero
+                [zero_position + (1 - zero_position) * 0.5, "#0d7a57"],  # Mid-dark green
+                [1.0, "#10b981"],  # Bright green at max_val
+            ],
+            zauto=False,
+            zmin=min_val,
+            zmax=max_val,
+            # REMOVED zmid=0 - this was causing the problem!
+            hovertemplate="<b>%{x}</b><br>%{y}<br>P/L: <b>€%{z:,.2f}</b><extra></extra>",
+            showscale=False,
+            colorbar=dict(
+                thickness=10,
+                len=0.7,
+                x=1.02,
+                tickformat="€.,0f",
+                tickfont=dict(size=10, color='#9ca3af'),
+                outlinewidth=0
+            ),
+            xgap=4,
+            ygap=6,
+        )
+    )
+
+    fig.update_layout(
+        height=80,
+        margin=dict(l=10, r=30, t=0, b=10),
+        xaxis=dict(
+            showgrid=False,
+            showticklabels=False,
+            zeroline=False,
+            type='category'
+        ),
+        yaxis=dict(
+            showgrid=False,
+            side='left',
+            tickfont=dict(size=11, color='#9ca3af'),
+            type='category',
+            autorange='reversed'
+        ),
+        plot_bgcolor='#1e1e1e',
+        paper_bgcolor='#1e1e1e',
+        font=dict(family='Arial')
+    )
+
+    return fig
@@ -0,0 +1,84 @@
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+BASE_CURRENCY = "EUR"
+
+# values[i, j] is the rate of currencies[j] against EUR on dates[i] (dates is None for a single fixing)
+RateMatrix = namedtuple("RateMatrix", ["currencies", "dates", "values"])
+
+
+def from_rates(rates):
+    """Build a one-row rate matrix from {currency: rate}"""
+    currencies = pd.Index([BASE_CURRENCY] + sorted(c for c in rates if c != BASE_CURRENCY))
+    values = np.array([[1.0] + [float(rates[c]) for c in currencies[1:]]])
+    return RateMatrix(currencies, None, values)
+
+
+def from_frame(rates):
+    """Build a dated rate matrix from a long (currency, date, rate) frame, carrying rates over non-working days"""
+    wide = rates.pivot_table(index="date", columns="currency", values="rate", aggfunc="last").sort_index().ffill()
+    wide = wide.drop(columns=BASE_CURRENCY, errors="ignore")
+    wide.insert(0, BASE_CURRENCY, 1.0)
+    return RateMatrix(pd.Index(wide.columns), pd.DatetimeIndex(wide.index), wide.to_numpy(dtype=float))
+
+
+def _currency_index(currencies, matrix):
+    """Map every currency code to its column in the matrix, -1 for a currency without rates"""
+    # Unused categories of a category column are not required to have a rate
+    codes = pd.Categorical(currencies).remove_unused_categories()
+    columns = matrix.currencies.get_indexer(codes.categories)
+    unknown = codes.categories[columns < 0]
+    if len(unknown):
+        print(f"No FX rate for {', '.join(map(str, unknown))}: amounts left unconverted")
+    # Gather through the categories so the hash lookup runs once per distinct currency, not per row;
+    # a missing currency (code -1) picks the appended 0 and is treated as EUR
+    return np.append(columns, 0)[codes.codes]
+
+
+def _date_index(dates, matrix):
+    """Map every date to the last matrix row published on or before it"""
+    positions = matrix.dates.searchsorted(pd.DatetimeIndex(dates), side="right") - 1
+    return np.clip(positions, 0, len(matrix.dates) - 1)
+
+
+def _rates_for(currencies, matrix, dates=None):
+    """Rate of every row: 1.0 for EUR, and for a currency without rates, whose amount is left unconverted"""
+    columns = _currency_index(currencies, matrix)
+    rates = np.ones(len(columns))
+    # EUR is column 0 and needs no lookup; a matrix without any fixing has nothing to look up
+    convert = columns > 0
+    if not convert.any() or len(matrix.values) == 0:
+        return rates
+    if dates is None or matrix.dates is None:
+        # Without dates every row uses the latest fixing
+        rows = len(matrix.values) - 1
+    else:
+        rows = _date_index(pd.DatetimeIndex(dates)[convert], matrix)
+    rates[convert] = matrix.values[rows, columns[convert]]
+    return rates
+
+
+def to_eur(amounts, currencies, matrix, dates=None, mask=None):
+    """
+        Convert amounts to EUR in one vectorized step.
+
+        Each row picks its rate with a NumPy gather on (date row, currency column) of the matrix.
+        Rows where mask is False are returned unchanged.
+    """
+    values = np.asarray(amounts, dtype=float)
+    converted = values / _rates_for(currencies, matrix, dates)
+    if mask is not None:
+        converted = np.where(np.asarray(mask, dtype=bool), converted, values)
+    if isinstance(amounts, pd.Series):
+        return pd.Series(converted, index=amounts.index, name=amounts.name)
+    return converted
+
+
+def from_eur(amounts, currencies, matrix, dates=None):
+    """Convert EUR amounts into each row's currency"""
+    values = np.asarray(amounts, dtype=float)
+    converted = values * _rates_for(currencies, matrix, dates)
+    if isinstance(amounts, pd.Series):
+        return pd.Series(converted, index=amounts.index, name=amounts.name)
+    return converted
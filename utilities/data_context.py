@@ -0,0 +1,74 @@
+import datetime
+import threading
+import time
+from utilities import cache, calculations, db_operations, fx_store, instrumentation
+
+# A session asks the shared transaction cache again at most this often; writes reload it at once
+TRANSACTIONS_FRESH_SECONDS = db_operations.DELTA_SECONDS
+# Today's rates are re-read at most this often, and always on a new day
+RATES_FRESH_SECONDS = fx_store.TODAY_RECHECK_SECONDS
+# Pages convert to these whether or not a transaction is in them, so they must have a rate; the rates of
+# the other currencies in the frame are best effort, and amounts without one are left unconverted
+DISPLAY_CURRENCIES = {"USD", "PLN"}
+
+_fx_generation = 0
+_fx_lock = threading.Lock()
+
+
+def _expire_rates():
+    global _fx_generation
+    with _fx_lock:
+        _fx_generation += 1
+
+
+cache.register(_expire_rates, cache.FX)
+
+
+class DataContext:
+    """
+        Transactions and today's FX rates of one session, reused across reruns until they are stale.
+
+        The frame is reloaded when the database, the owner or the period changes, when the owner's transactions
+        are written or invalidated (db_operations.data_version), or after TRANSACTIONS_FRESH_SECONDS. The rates
+        are reloaded on a new day, for a currency not loaded yet, when FX is invalidated, or after
+        RATES_FRESH_SECONDS.
+        A rerun in between, like a widget click, costs no query and no HTTP call.
+    """
+
+    def __init__(self):
+        self.df = None
+        self.rates = None
+        self._df_key = None
+        self._df_at = 0.0
+        self._currencies = frozenset()
+        self._rates_currencies = frozenset()
+        self._rates_key = None
+        self._rates_at = 0.0
+
+    def refresh(self, engine, owner, since=None):
+        """Reload whatever is stale; raises LookupError when today's rates of DISPLAY_CURRENCIES are unavailable"""
+        now = time.monotonic()
+        with instrumentation.span("data_context.transactions") as s:
+            key = (engine, owner, since, db_operations.data_version(owner))
+            s.hit = self.df is not None and self._df_key == key and now - self._df_at < TRANSACTIONS_FRESH_SECONDS
+            if not s.hit:
+                self.df = db_operations.load_data(engine, owner, since)
+                # Read after loading: the load itself may bump the version
+                self._df_key = (engine, owner, since, db_operations.data_version(owner))
+                self._df_at = now
+                self._currencies = frozenset(
+                    (DISPLAY_CURRENCIES | set(self.df["currency"].dropna())) - {fx_store.BASE_CURRENCY})
+            s.rows = len(self.df)
+
+        key = (datetime.date.today(), _fx_generation)
+        with instrumentation.span("data_context.rates") as s:
+            # Compared with the currencies asked for, not the ones found: a currency without rates is not
+            # asked for again on every rerun
+            s.hit = (self.rates is not None and self._rates_key == key and self._currencies <= self._rates_currencies
+                     and now - self._rates_at < RATES_FRESH_SECONDS)
+            if not s.hit:
+                self.rates = calculations.today_rates(self._currencies, required=DISPLAY_CURRENCIES)
+                self._rates_currencies = self._currencies
+                self._rates_key = key
+                self._rates_at = now
+        return self
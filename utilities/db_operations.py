@@ -1,43 +1,249 @@
-from sqlalchemy import create_engine, text, update, MetaData, Table
+import threading
+import time
 import streamlit as st
 import pandas as pd
+from utilities import cache, instrumentation, repository, schema, storage
+
+# Defaults, each can be overridden in the [db_pool] section of secrets.toml
+POOL_SETTINGS = {
+    "pool_size": 5,
+    "max_overflow": 5,
+    "pool_timeout": 30,  # seconds to wait for a free connection
+    "pool_recycle": 1800,  # seconds, Neon closes idle connections on its side
+    "statement_timeout_ms": 15000,
+}
+
+_pool_counters = {"connects": 0, "checkouts": 0, "checkins": 0, "invalidations": 0}
+_pool_lock = threading.Lock()
+_transaction_caches = {}
+_caches_lock = threading.Lock()
+# Data versions per owner, plus a generation moved by invalidations of every owner at once
+_data_versions = {}
+_data_generation = 0
+_version_lock = threading.Lock()
+
+
+def _count(name):
+    def listener(*args):
+        with _pool_lock:
+            _pool_counters[name] += 1
+    return listener
 
 
 def get_connection():
-    # Connect to Neon PostgreSQL
-    return create_engine(st.secrets["db_connection"])
+    """Return the process-wide engine: one connection pool shared by every session and rerun"""
+    return _engine(storage.database_url())
 
 
-# Load current data
-@st.cache_data(ttl=600)  # cache results for 5 minutes
-def load_data(_engine):
-    query = "SELECT * FROM transactions ORDER BY id"
-    df = pd.read_sql(query, _engine)
-    return df
+@st.cache_resource
+def _engine(url):
+    from sqlalchemy import event
+
+    settings = {**POOL_SETTINGS, **st.secrets.get("db_pool", {})}
+    # Neon PostgreSQL in production, a local SQLite file in development
+    engine = storage.create_database_engine(url, **storage.engine_options(url, settings))
+    if url == storage.DEV_DATABASE_URL:
+        storage.prepare_dev_database(engine)
+    event.listen(engine, "connect", _count("connects"))
+    event.listen(engine, "checkout", _count("checkouts"))
+    event.listen(engine, "checkin", _count("checkins"))
+    event.listen(engine, "invalidate", _count("invalidations"))
+    return engine
+
+
+def pool_status():
+    """Return pool usage counters of the shared engine for monitoring"""
+    pool = get_connection().pool
+    with _pool_lock:
+        status = dict(_pool_counters)
+    status.update({
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+    })
+    return status
+
+
+# How often other sessions' writes are picked up, and how often the whole table is re-read anyway
+DELTA_SECONDS = 60
+FULL_RELOAD_SECONDS = 3600
+# now() is the transaction start time, so a row committed late can carry an older updated_at
+WATERMARK_OVERLAP = pd.Timedelta(minutes=5)
+# Above this many rows a page asking for a period gets only that period, filtered by Postgres
+PUSHDOWN_ROWS = 200_000
+
+
+class TransactionCache:
+    """Last full transactions frame of one owner plus the (id, updated_at) high-water mark it is loaded up to"""
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.lock = threading.Lock()
+        self.df = None
+        self.loaded_at = 0.0
+        self.checked_at = 0.0
+        self.stale = False
+
+    def full_load(self, engine):
+        from sqlalchemy import text
+        with instrumentation.span("db.full_load") as s:
+            df = pd.read_sql(text("SELECT * FROM transactions WHERE owner = :owner ORDER BY id"), engine,
+                             params={"owner": self.owner})
+            self.df = schema.normalise_transactions(df)
+            s.rows = len(self.df)
+        _bump_version(self.owner)
+        self.loaded_at = self.checked_at = time.monotonic()
+        self.stale = False
+
+    def delta_load(self, engine):
+        df = self.df
+        params = {"owner": self.owner, "max_id": int(df["id"].max()) if not df.empty else 0}
+        if "updated_at" in df.columns and df["updated_at"].notna().any():
+            query = ("SELECT * FROM transactions WHERE owner = :owner AND (id > :max_id OR updated_at > :since) "
+                     "ORDER BY id")
+            params["since"] = (df["updated_at"].max() - WATERMARK_OVERLAP).to_pydatetime()
+        elif self.stale:
+            # Without updated_at, in-place updates cannot be detected
+            return self.full_load(engine)
+        else:
+            query = "SELECT * FROM transactions WHERE owner = :owner AND id > :max_id ORDER BY id"
+
+        from sqlalchemy import text
+        with instrumentation.span("db.delta_load") as s, engine.connect() as conn:
+            delta = pd.read_sql(text(query), conn, params=params)
+            row_count = conn.execute(text("SELECT count(*) FROM transactions WHERE owner = :owner"),
+                                     {"owner": self.owner}).scalar()
+            s.rows = len(delta)
+
+        if not delta.empty and "updated_at" in df.columns and "updated_at" in delta.columns:
+            # The overlap window returns the rows of the last updates again on every check: keep only the
+            # rows that are new or changed since they were cached
+            cached = pd.MultiIndex.from_arrays([df["id"], df["updated_at"]])
+            fetched = pd.MultiIndex.from_arrays([delta["id"], pd.to_datetime(delta["updated_at"], utc=True)])
+            delta = delta[~fetched.isin(cached)]
+        if not delta.empty:
+            df = pd.concat([df[~df["id"].isin(delta["id"])], delta], ignore_index=True)
+            # Concatenating categoricals with raw strings falls back to object: cast the merged frame again
+            df = schema.normalise_transactions(df)
+        if len(df) != row_count:
+            # Rows were deleted: only a full load can tell which
+            return self.full_load(engine)
+        if not delta.empty:
+            _bump_version(self.owner)
+        self.df = df
+        self.checked_at = time.monotonic()
+        self.stale = False
+
+
+def _transaction_cache(owner):
+    """The process-wide TransactionCache of an owner, shared by all their sessions"""
+    with _caches_lock:
+        if owner not in _transaction_caches:
+            _transaction_caches[owner] = TransactionCache(owner)
+        return _transaction_caches[owner]
+
 
+@cache.cached(cache.TRANSACTIONS, ttl=FULL_RELOAD_SECONDS)
+def count_transactions(_engine, owner):
+    from sqlalchemy import text
+    with _engine.connect() as conn:
+        return conn.execute(text("SELECT count(*) FROM transactions WHERE owner = :owner"), {"owner": owner}).scalar()
 
-def clear_cache():
-    """Clear all cached data"""
-    st.cache_data.clear()
 
+@cache.cached(cache.TRANSACTIONS, ttl=DELTA_SECONDS)
+def load_period(_engine, owner, since):
+    """Return the owner's transactions sold on or after since, plus every open one"""
+    from sqlalchemy import text
+    with instrumentation.span("db.load_period") as s, _engine.connect() as conn:
+        df = pd.read_sql(text("SELECT * FROM transactions "
+                              "WHERE owner = :owner AND (date_sell >= :since OR date_sell IS NULL)"),
+                         conn, params={"owner": owner, "since": since})
+        s.rows = len(df)
+    # No version bump here: a cache hit skips this body, and writes and refreshes already bump it
+    return schema.normalise_transactions(df)
 
-def load_cached_data():
+
+def load_data(_engine, owner, since=None):
+    """
+        Return the transactions of owner, fetching only the rows inserted or updated since the last load.
+
+        With since (a date), an owner with more than PUSHDOWN_ROWS transactions is not held in memory: only
+        the rows of that period are read.
+    """
+    if since is not None and count_transactions(_engine, owner) > PUSHDOWN_ROWS:
+        return load_period(_engine, owner, since)
+    cache = _transaction_cache(owner)
+    with instrumentation.span("db_operations.load_data") as s, cache.lock:
+        now = time.monotonic()
+        s.hit = False
+        if cache.df is None or now - cache.loaded_at > FULL_RELOAD_SECONDS:
+            cache.full_load(_engine)
+        elif cache.stale or now - cache.checked_at > DELTA_SECONDS:
+            cache.delta_load(_engine)
+        else:
+            s.hit = True
+        s.rows = len(cache.df)
+        return cache.df.copy()
+
+
+def _bump_version(owner=None):
+    """Move the data version of owner, or of every owner"""
+    global _data_generation
+    with _version_lock:
+        if owner is None:
+            _data_generation += 1
+        else:
+            _data_versions[owner] = _data_versions.get(owner, 0) + 1
+
+
+def data_version(owner):
+    """Number that changes whenever the loaded transactions of owner may have changed, to key derived caches"""
+    # Both parts only grow, so their sum moves whenever either does
+    return _data_generation + _data_versions.get(owner, 0)
+
+
+def _mark_transactions_stale():
+    with _caches_lock:
+        caches = list(_transaction_caches.values())
+    for transaction_cache in caches:
+        transaction_cache.stale = True
+    _bump_version()
+
+
+cache.register(_mark_transactions_stale, cache.TRANSACTIONS)
+
+
+def clear_cache(owner=None):
+    """
+        Invalidate the data depending on transactions, keeping prices, FX rates and news.
+
+        After a write of one owner, pass owner: only their transactions are reloaded, and the sessions of other
+        owners keep their data and derived caches.
+    """
+    if owner is None:
+        cache.invalidate(cache.TRANSACTIONS)
+        return
+    _transaction_cache(owner).stale = True
+    _bump_version(owner)
+    # Cheap to rebuild, and cleared whole: Streamlit cannot clear the entries of one owner
+    count_transactions.clear()
+    load_period.clear()
+
+
+def load_cached_data(owner):
     """Load data from database with caching"""
     engine = get_connection()
-    df = load_data(engine)
+    df = load_data(engine, owner)
     return df
 
 
-def new_stock_to_db(engine, stock, price_buy, date_buy, quantity_buy,
+@instrumentation.timed()
+def new_stock_to_db(engine, owner, stock, price_buy, date_buy, quantity_buy,
                     price_sell, date_sell, quantity_sell, currency, ticker, dividends):
     if stock and price_buy > 0 and date_buy:
         with engine.begin() as conn:
-            conn.execute(text("""
-                INSERT INTO transactions (stock, ticker, price_buy, date_buy, quantity_buy,
-                                          price_sell, date_sell, quantity_sell, currency, dividends)
-                VALUES (:stock, :ticker, :price_buy, :date_buy, :quantity_buy,
-                        :price_sell, :date_sell, :quantity_sell, :currency, :dividends)
-            """), {
+            repository.insert_transactions(conn, {
                 "stock": stock,
                 "ticker": ticker,
                 "price_buy": price_buy,
@@ -47,68 +253,36 @@ def new_stock_to_db(engine, stock, price_buy, date_buy, quantity_buy,
                 "date_sell": date_sell,
                 "quantity_sell": quantity_sell,
                 "currency": currency,
-                "dividends": dividends
+                "dividends": dividends,
+                "owner": owner,
             })
         st.success("Transaction added.")
         st.session_state.show_form = False
-        st.cache_data.clear()
+        clear_cache(owner)
         st.rerun()
     else:
         st.error("Please fill all fields.")
 
 
-def close_stock(engine, stock, price_sell, date_sell, quantity_sell, dividends):
+@instrumentation.timed()
+def close_stock(engine, owner, stock, price_sell, date_sell, quantity_sell, dividends):
     if stock and price_sell > 0 and date_sell:
-        metadata = MetaData()
-        transactions_table = Table("transactions", metadata, autoload_with=engine)
-        with engine.connect() as conn:
-            stmt = (
-                update(transactions_table)
-                .where(
-                    (transactions_table.c.stock == stock) &
-                    (transactions_table.c.date_sell == None)
-                )
-                .values(
-                    price_sell=price_sell,
-                    quantity_sell=quantity_sell,
-                    date_sell=date_sell,
-                    dividends=dividends
-                )
-            )
-            conn.execute(stmt)
-            conn.commit()
-            st.success("Transaction closed!")
-            st.session_state.show_form2 = False
-            st.cache_data.clear()
-            st.rerun()
+        with engine.begin() as conn:
+            repository.close_position(conn, owner, stock, price_sell, date_sell, quantity_sell, dividends)
+        st.success("Transaction closed!")
+        st.session_state.show_form2 = False
+        clear_cache(owner)
+        st.rerun()
     else:
         st.error("Please fill all fields.")
 
 
-def add_etf(engine, selected_stock, new_price, new_qty):
+@instrumentation.timed()
+def add_etf(engine, owner, selected_stock, new_price, new_qty):
     if selected_stock and new_price > 0 and new_qty > 0:
-        metadata = MetaData()
-        transactions_table = Table("transactions", metadata, autoload_with=engine)
-        avg = ((transactions_table.c.price_buy * transactions_table.c.quantity_buy) +
-               (new_price * new_qty)) / (transactions_table.c.quantity_buy + new_qty)
-        with engine.connect() as conn:
-            stmt = (
-                update(transactions_table)
-                .where(
-                    (transactions_table.c.stock == selected_stock) &
-                    (transactions_table.c.date_sell == None)
-                )
-                .values(
-                    price_buy=avg,
-                    quantity_buy=transactions_table.c.quantity_buy + new_qty,
-                )
-            )
-            conn.execute(stmt)
-            conn.commit()
-            st.success("ETF buying added")
+        with engine.begin() as conn:
+            repository.add_to_position(conn, owner, selected_stock, new_price, new_qty)
+        st.success("ETF buying added")
     else:
         st.error("Please fill all fields.")
 
-
-# df = load_cached_data()
-# df.to_csv(r"C:\Users\gianm\OneDrive\Desktop\finances_db_test")
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+from utilities import conversion, instrumentation
+
+# Lots are marked to market in column blocks to bound the days x lots working memory
+LOT_CHUNK = 512
+
+
+@instrumentation.timed()
+def daily_equity_curve(df, closes, rates):
+    """
+        Daily portfolio P/L in EUR, with every lot marked to market on each day it is held.
+
+        df holds the lots with the calculate_metrics columns (earning is the realised EUR result of closed
+        lots); closes is a day by ticker frame from price_store.get_closes. A lot counts at market value
+        from its buy date up to its sell date, and with its realised earning from then on.
+    """
+    days = closes.index.to_numpy(dtype="datetime64[ns]")
+    buy = df["date_buy"].to_numpy(dtype="datetime64[ns]")
+    sell = df["date_sell"].to_numpy(dtype="datetime64[ns]")
+    closed = ~np.isnat(sell)
+
+    # Realised results enter on the sell day and stay: one cumulative sum over day buckets
+    earning = df["earning"].to_numpy(dtype=float)
+    sell_day = np.searchsorted(days, sell[closed])
+    in_range = sell_day < len(days)
+    realised = np.cumsum(np.bincount(sell_day[in_range], weights=np.nan_to_num(earning[closed][in_range]),
+                                     minlength=len(days)))
+
+    # Unrealised P/L: gather each lot's ticker column from the close matrix, then mask by holding period
+    prices = closes.to_numpy(dtype=float)
+    columns = closes.columns.get_indexer(df["ticker"])
+    quantity = df["quantity_buy"].to_numpy(dtype=float)
+    cost = df["price_buy"].to_numpy(dtype=float) * quantity
+    to_eur = conversion.to_eur(np.ones(len(df)), df["currency"].to_numpy(dtype=object), conversion.from_rates(rates))
+
+    unrealised = np.zeros(len(days))
+    for start in range(0, len(df), LOT_CHUNK):
+        lots = slice(start, start + LOT_CHUNK)
+        marked = prices[:, columns[lots]] * quantity[lots] - cost[lots]
+        held = ((days[:, None] >= buy[lots]) &
+                (np.isnat(sell[lots]) | (days[:, None] < sell[lots])) &
+                (columns[lots] >= 0) & ~np.isnan(marked))
+        unrealised += np.where(held, marked * to_eur[lots], 0).sum(axis=1)
+
+    return pd.DataFrame({"realised": realised, "unrealised": unrealised, "equity": realised + unrealised},
+                        index=closes.index)
@@ -0,0 +1,55 @@
+import threading
+from utilities import io_metrics
+
+FX_URL = "https://api.frankfurter.dev/v1"
+BASE_CURRENCY = "EUR"
+# The ECB reference currencies Frankfurter publishes; a request with any other symbol fails as a whole
+CURRENCIES = frozenset({
+    "EUR", "AUD", "BGN", "BRL", "CAD", "CHF", "CNY", "CZK", "DKK", "GBP", "HKD", "HUF", "IDR", "ILS", "INR", "ISK",
+    "JPY", "KRW", "MXN", "MYR", "NOK", "NZD", "PHP", "PLN", "RON", "SEK", "SGD", "THB", "TRY", "USD", "ZAR",
+})
+TIMEOUT = (3.05, 10)  # (connect, read) seconds
+# Exponential backoff 0.5s, 1s, 2s; bounded by the number of retries
+RETRY_SETTINGS = dict(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=("GET",),
+    raise_on_status=False,
+)
+
+_session = None
+_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide session, keeping TLS connections to the FX API alive between calls"""
+    global _session
+    with _lock:
+        if _session is None:
+            # requests is only imported once the first rate is actually fetched
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            session = requests.Session()
+            retries = Retry(**RETRY_SETTINGS)
+            session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=16, max_retries=retries))
+            _session = session
+    return _session
+
+
+def get_json(path, params=None):
+    with io_metrics.observe("frankfurter") as call:
+        r = get_session().get(f"{FX_URL}/{path}", params=params, timeout=TIMEOUT)
+        call.bytes = len(r.content)
+        retries = getattr(r.raw, "retries", None)
+        call.retries = len(retries.history) if retries else 0
+        r.raise_for_status()
+        return r.json()
+
+
+def timeseries(symbols, start, end):
+    """Return {date: {currency: rate}} for several currencies over a date range with one request"""
+    params = {"base": BASE_CURRENCY, "symbols": ",".join(sorted(symbols))}
+    return get_json(f"{start.isoformat()}..{end.isoformat()}", params).get("rates", {})
@@ -0,0 +1,124 @@
+import datetime
+import threading
+import time
+import pandas as pd
+from utilities import cache, fx_client, instrumentation, local_store
+
+BASE_CURRENCY = fx_client.BASE_CURRENCY
+# Rates are published on working days only: fetch a few extra days so weekends resolve to Friday
+LOOKBACK_DAYS = 7
+# A range ending today is re-checked at most once per hour (ECB publishes once a day)
+TODAY_RECHECK_SECONDS = 3600
+
+_lock = threading.Lock()
+
+
+def _init(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fx_rates (
+            currency TEXT NOT NULL,
+            date TEXT NOT NULL,
+            rate REAL NOT NULL,
+            PRIMARY KEY (currency, date)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fx_coverage (
+            currency TEXT PRIMARY KEY,
+            first TEXT NOT NULL,
+            last TEXT NOT NULL,
+            checked_at REAL NOT NULL
+        )
+    """)
+
+
+@instrumentation.timed()
+def _fetch_timeseries(currencies, start, end):
+    """Fetch daily EUR rates for several currencies with one time-series request"""
+    rates = fx_client.timeseries(currencies, start, end)
+    return [(currency, day, rate) for day, by_currency in rates.items() for currency, rate in by_currency.items()]
+
+
+def ensure_rates(currencies, start, end):
+    """Make sure the store covers [start, end] for every currency, downloading only missing dates"""
+    # An unpublished symbol would fail the shared request of every currency batched with it
+    currencies = {c for c in currencies if c in fx_client.CURRENCIES and c != BASE_CURRENCY}
+    if not currencies:
+        return
+    today = datetime.date.today()
+    end = min(end, today)
+    start = min(start, end)
+
+    with _lock, local_store.connect() as conn:
+        _init(conn)
+        coverage = {row[0]: row[1:] for row in conn.execute("SELECT currency, first, last, checked_at FROM fx_coverage")}
+        now = time.time()
+
+        # Currencies missing the same range share a single multi-symbol request
+        to_fetch = {}
+        for currency in currencies:
+            for missing in local_store.missing_ranges(coverage.get(currency), start, end, today, now,
+                                                      LOOKBACK_DAYS, TODAY_RECHECK_SECONDS):
+                to_fetch.setdefault(missing, set()).add(currency)
+
+        for (fetch_start, fetch_end), group in to_fetch.items():
+            try:
+                rows = _fetch_timeseries(group, fetch_start, fetch_end)
+            except Exception as e:
+                print(f'Error fetching exchange rates: {str(e)}')
+                continue
+            conn.executemany("INSERT OR REPLACE INTO fx_rates (currency, date, rate) VALUES (?, ?, ?)", rows)
+            for currency in group:
+                old = coverage.get(currency)
+                first = min(fetch_start.isoformat(), old[0]) if old else fetch_start.isoformat()
+                last = max(fetch_end.isoformat(), old[1]) if old else fetch_end.isoformat()
+                conn.execute("INSERT OR REPLACE INTO fx_coverage (currency, first, last, checked_at) VALUES (?, ?, ?, ?)",
+                             (currency, first, last, now))
+
+
+@instrumentation.timed()
+def get_rates(currencies, start, end):
+    """Return stored daily rates (currency, date, rate) for the given currencies and range"""
+    currencies = sorted({c for c in currencies if c and c != BASE_CURRENCY})
+    if not currencies:
+        return pd.DataFrame({"currency": pd.Series(dtype=str),
+                             "date": pd.Series(dtype="datetime64[ns]"),
+                             "rate": pd.Series(dtype=float)})
+    ensure_rates(currencies, start, end)
+    placeholders = ",".join("?" * len(currencies))
+    with local_store.connect() as conn:
+        _init(conn)
+        rates = pd.read_sql_query(
+            f"SELECT currency, date, rate FROM fx_rates "
+            f"WHERE currency IN ({placeholders}) AND date BETWEEN ? AND ? ORDER BY date",
+            conn,
+            params=[*currencies, (start - datetime.timedelta(days=LOOKBACK_DAYS)).isoformat(), end.isoformat()],
+        )
+    rates["date"] = pd.to_datetime(rates["date"])
+    return rates
+
+
+def rates_on(currencies, day, required=None):
+    """
+        Return {currency: rate} with the last published EUR rate on or before day.
+
+        Raises LookupError when one of required (by default every currency) has no rate; the others are
+        left out of the result.
+    """
+    rates = get_rates(currencies, day, day)
+    latest = rates.groupby("currency")["rate"].last()
+    required = currencies if required is None else required
+    missing = sorted({c for c in required if c and c != BASE_CURRENCY} - set(latest.index))
+    if missing:
+        raise LookupError(f"No exchange rate available for {', '.join(missing)} on {day}")
+    return {currency: float(latest[currency]) for currency in latest.index}
+
+
+def expire_today():
+    """Force today's rates to be re-checked on the next lookup"""
+    with _lock, local_store.connect() as conn:
+        _init(conn)
+        conn.execute("UPDATE fx_coverage SET checked_at = 0")
+
+
+cache.register(expire_today, cache.FX)
@@ -0,0 +1,202 @@
+import os
+import zipfile
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from utilities import db_operations, fx_client, instrumentation, repository
+
+# Rows validated and inserted per step, so a long export is never held in memory twice
+CHUNK_ROWS = 20_000
+COLUMNS = ["stock", "ticker", "price_buy", "date_buy", "quantity_buy",
+           "price_sell", "date_sell", "quantity_sell", "currency", "dividends"]
+REQUIRED = ["stock", "price_buy", "date_buy", "quantity_buy", "currency"]
+# Header names of common broker exports, lower-cased, mapped to transactions columns
+COLUMN_ALIASES = {
+    "name": "stock",
+    "instrument": "stock",
+    "product": "stock",
+    "symbol": "ticker",
+    "buy price": "price_buy",
+    "open price": "price_buy",
+    "buy date": "date_buy",
+    "open date": "date_buy",
+    "quantity": "quantity_buy",
+    "units": "quantity_buy",
+    "sell price": "price_sell",
+    "close price": "price_sell",
+    "sell date": "date_sell",
+    "close date": "date_sell",
+    "ccy": "currency",
+}
+ImportResult = namedtuple("ImportResult", ["inserted", "duplicates", "rejected"])
+
+
+def read_chunks(file, name, chunk_rows=CHUNK_ROWS):
+    """
+        Yield the rows of a CSV or XLSX export as frames of at most chunk_rows rows.
+
+        A file that cannot be read raises ValueError, like pandas does for a malformed CSV.
+    """
+    extension = os.path.splitext(name)[1].lower()
+    if extension == ".csv":
+        yield from pd.read_csv(file, chunksize=chunk_rows, dtype=str, skipinitialspace=True)
+    elif extension in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+        try:
+            workbook = load_workbook(file, read_only=True, data_only=True)
+        except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+            # KeyError: a ZIP archive without the parts of a workbook
+            raise ValueError(f"not a readable XLSX file ({e})") from None
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(cell) if cell is not None else "" for cell in next(rows, ())]
+            chunk, start = [], 0
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) == chunk_rows:
+                    # Number rows across chunks, like read_csv does
+                    yield pd.DataFrame(chunk, columns=header, index=range(start, start + len(chunk)))
+                    chunk, start = [], start + len(chunk)
+            if chunk:
+                yield pd.DataFrame(chunk, columns=header, index=range(start, start + len(chunk)))
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"Unsupported file type: {extension or name}")
+
+
+def normalise(chunk, dayfirst=False):
+    """
+        Map an export chunk to transactions columns and validate every row at once.
+
+        Returns the normalised rows and, aligned with them, the reason each invalid row is rejected
+        (an empty string for valid rows).
+    """
+    chunk = chunk.rename(columns=lambda c: str(c).strip().lower()).rename(columns=COLUMN_ALIASES)
+    missing = [column for column in REQUIRED if column not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    chunk = chunk.reindex(columns=COLUMNS)
+
+    def strings(column):
+        values = chunk[column].astype("string").str.strip()
+        return values.mask(values == "")
+
+    rows = pd.DataFrame({
+        "stock": strings("stock"),
+        "ticker": strings("ticker").str.upper(),
+        "price_buy": pd.to_numeric(chunk["price_buy"], errors="coerce"),
+        "date_buy": pd.to_datetime(chunk["date_buy"], errors="coerce", dayfirst=dayfirst),
+        "quantity_buy": pd.to_numeric(chunk["quantity_buy"], errors="coerce"),
+        "price_sell": pd.to_numeric(chunk["price_sell"], errors="coerce"),
+        "date_sell": pd.to_datetime(chunk["date_sell"], errors="coerce", dayfirst=dayfirst),
+        "quantity_sell": pd.to_numeric(chunk["quantity_sell"], errors="coerce"),
+        "currency": strings("currency").str.upper(),
+        "dividends": pd.to_numeric(chunk["dividends"], errors="coerce").fillna(0.0),
+    })
+    sold = rows["date_sell"].notna()
+    # Like the add transaction form, a sold lot is sold in full unless stated otherwise
+    rows["quantity_sell"] = rows["quantity_sell"].where(~sold | rows["quantity_sell"].notna(), rows["quantity_buy"])
+
+    reason = np.select(
+        [
+            rows["stock"].isna(),
+            rows["date_buy"].isna(),
+            ~(rows["price_buy"] > 0),
+            ~(rows["quantity_buy"] > 0),
+            ~rows["currency"].str.fullmatch(r"[A-Z]{3}").fillna(False).astype(bool),
+            # Amounts in a currency without FX rates could never be converted
+            ~rows["currency"].isin(fx_client.CURRENCIES),
+            strings("date_sell").notna() & ~sold,
+            sold & (rows["date_sell"] < rows["date_buy"]),
+            sold & ~(rows["price_sell"] >= 0),
+            ~sold & rows["price_sell"].notna(),
+        ],
+        [
+            "missing stock",
+            "invalid date_buy",
+            "price_buy must be positive",
+            "quantity_buy must be positive",
+            "invalid currency",
+            "unsupported currency",
+            "invalid date_sell",
+            "date_sell before date_buy",
+            "missing price_sell",
+            "price_sell without date_sell",
+        ],
+        default="",
+    )
+    return rows, pd.Series(reason, index=rows.index)
+
+
+def _keys(df, earlier=None):
+    """
+        Dedupe key per row: a hash of stock, ticker, currency, dates, price and quantity (rounded, so float
+        noise does not hide a duplicate), and the occurrence of that hash so far.
+
+        Identical fills in one file keep distinct keys, and importing the file again matches each of them
+        with its own copy in the table. earlier counts the hashes of the rows before df in the same file.
+    """
+    def text(column):
+        return df[column].astype("string").fillna("")
+
+    fields = pd.DataFrame({
+        "stock": text("stock"),
+        "ticker": text("ticker"),
+        "currency": text("currency"),
+        "date_buy": pd.to_datetime(df["date_buy"]),
+        "date_sell": pd.to_datetime(df["date_sell"]),
+        "price_buy": df["price_buy"].astype(float).round(6),
+        "quantity_buy": df["quantity_buy"].astype(float).round(6),
+    })
+    hashes = pd.Series(pd.util.hash_pandas_object(fields, index=False).to_numpy())
+    occurrence = hashes.groupby(hashes).cumcount()
+    if earlier is not None:
+        occurrence += hashes.map(earlier).fillna(0).astype(np.int64)
+    return pd.MultiIndex.from_arrays([hashes, occurrence])
+
+
+def _records(rows):
+    """Rows as parameter dicts, with missing values as NULL and dates as dates"""
+    rows = rows.assign(date_buy=rows["date_buy"].dt.date, date_sell=rows["date_sell"].dt.date)
+    return rows.astype(object).where(rows.notna(), None).to_dict("records")
+
+
+@instrumentation.timed()
+def import_transactions(engine, owner, file, name, dayfirst=False):
+    """
+        Import a broker export as transactions of owner in one database transaction, skipping invalid and
+        duplicate rows.
+
+        Each chunk is validated and de-duplicated against the table in vectorized form, then inserted with a single executemany. Caches are invalidated once, at the end.
+    """
+    # Duplicates are checked against the owner's rows only: two people may hold the same lot
+    seen = _keys(db_operations.load_data(engine, owner))
+    earlier = pd.Series(dtype=np.int64)
+    inserted = duplicates = 0
+    rejected = []
+    with engine.begin() as conn:
+        for chunk in read_chunks(file, name):
+            rows, reason = normalise(chunk, dayfirst)
+            invalid = reason != ""
+            if invalid.any():
+                # Report rows with their line in the file: header is line 1
+                bad = chunk[invalid.to_numpy()].assign(line=rows.index[invalid.to_numpy()] + 2, reason=reason[invalid])
+                rejected.append(bad)
+            rows = rows[~invalid]
+
+            keys = _keys(rows, earlier)
+            earlier = earlier.add(keys.get_level_values(0).value_counts(), fill_value=0)
+            duplicate = keys.isin(seen)
+            duplicates += int(duplicate.sum())
+            rows = rows[~duplicate]
+
+            if not rows.empty:
+                repository.insert_transactions(conn, _records(rows.assign(owner=owner)))
+                inserted += len(rows)
+
+    if inserted:
+        db_operations.clear_cache(owner)
+    rejected = pd.concat(rejected, ignore_index=True) if rejected else pd.DataFrame(columns=["line", "reason"])
+    return ImportResult(inserted, duplicates, rejected)
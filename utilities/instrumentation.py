@@ -0,0 +1,118 @@
+import contextlib
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+
+# One JSON object per page render, appended for later aggregation
+LOG_PATH = os.environ.get("FINANCES_PERF_LOG", os.path.join("logs", "perf.jsonl"))
+
+# Streamlit runs every script run in its own thread, so the current render is thread-local
+_local = threading.local()
+_log_lock = threading.Lock()
+
+
+class Render:
+    """Timings of one page render: wall time, calls, rows and cache hits/misses per instrumented name"""
+
+    def __init__(self, page):
+        self.page = page
+        self.started_at = datetime.datetime.now()
+        self.started = time.perf_counter()
+        self.stats = {}
+
+    def record(self, name, seconds=0.0, rows=None, hit=None):
+        stat = self.stats.setdefault(name, {"calls": 0, "ms": 0.0, "rows": 0, "hits": 0, "misses": 0})
+        stat["calls"] += 1
+        stat["ms"] += seconds * 1000
+        if rows is not None:
+            stat["rows"] += rows
+        if hit is True:
+            stat["hits"] += 1
+        elif hit is False:
+            stat["misses"] += 1
+
+    def summary(self):
+        return {
+            "ts": self.started_at.isoformat(timespec="milliseconds"),
+            "page": self.page,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "functions": {name: {**stat, "ms": round(stat["ms"], 2)} for name, stat in self.stats.items()},
+        }
+
+
+def begin_render(page):
+    """Start collecting timings for the current script run"""
+    _local.render = Render(page)
+
+
+def current_render():
+    return getattr(_local, "render", None)
+
+
+def end_render():
+    """Stop collecting, append the render to the JSONL log and return its summary"""
+    render = current_render()
+    _local.render = None
+    if render is None:
+        return None
+    summary = render.summary()
+    try:
+        os.makedirs(os.path.dirname(LOG_PATH) or ".", exist_ok=True)
+        with _log_lock, open(LOG_PATH, "a") as f:
+            f.write(json.dumps(summary) + "\n")
+    except OSError as e:
+        print(f"Could not write performance log: {e}")
+    return summary
+
+
+def rows_of(result):
+    if hasattr(result, "shape"):
+        return result.shape[0] if result.shape else None
+    if isinstance(result, (dict, list, tuple)):
+        return len(result)
+    return None
+
+
+def record(name, seconds=0.0, rows=None, hit=None):
+    """Record an event in the current render; a no-op outside a render (e.g. background threads)"""
+    render = current_render()
+    if render is not None:
+        render.record(name, seconds, rows, hit)
+
+
+class Span:
+    def __init__(self):
+        self.rows = None
+        self.hit = None
+
+
+@contextlib.contextmanager
+def span(name):
+    """Time a block; set .rows / .hit on the yielded span to record them too"""
+    s = Span()
+    start = time.perf_counter()
+    try:
+        yield s
+    finally:
+        record(name, time.perf_counter() - start, s.rows, s.hit)
+
+
+def timed(name=None):
+    """Decorator recording wall time, call count and returned rows of a function"""
+    def decorator(fn):
+        label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = None
+            try:
+                result = fn(*args, **kwargs)
+                return result
+            finally:
+                record(label, time.perf_counter() - start, rows_of(result))
+        return wrapper
+    return decorator
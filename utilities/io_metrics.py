@@ -0,0 +1,154 @@
+import contextlib
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency histogram buckets, in seconds
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Prometheus textfile export, rewritten at most every EXPORT_INTERVAL seconds
+METRICS_FILE = os.environ.get("FINANCES_METRICS_FILE", os.path.join("logs", "io_metrics.prom"))
+EXPORT_INTERVAL = 15
+# Set to serve /metrics over HTTP on this port
+METRICS_PORT = os.environ.get("FINANCES_METRICS_PORT")
+
+_lock = threading.Lock()
+_endpoints = {}
+_errors = {}  # (endpoint, error class) -> count
+_last_export = 0.0
+_server = None
+
+
+class Call:
+    """One outbound call; the caller can set bytes and retries before the block ends"""
+
+    def __init__(self):
+        # None when the client does not expose the response size (yfinance), so no zero is reported
+        self.bytes = None
+        self.retries = 0
+        self.error = None
+
+
+def _endpoint(name):
+    if name not in _endpoints:
+        _endpoints[name] = {"buckets": [0] * len(BUCKETS), "count": 0, "sum": 0.0, "bytes": None, "retries": 0}
+    return _endpoints[name]
+
+
+def _record(name, seconds, call):
+    with _lock:
+        metrics = _endpoint(name)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                metrics["buckets"][i] += 1
+        metrics["count"] += 1
+        metrics["sum"] += seconds
+        if call.bytes is not None:
+            metrics["bytes"] = (metrics["bytes"] or 0) + call.bytes
+        metrics["retries"] += call.retries
+        if call.error:
+            _errors[(name, call.error)] = _errors.get((name, call.error), 0) + 1
+
+
+@contextlib.contextmanager
+def observe(endpoint):
+    """Record latency, bytes, retries and error class of one outbound call to endpoint"""
+    call = Call()
+    start = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        call.error = type(e).__name__
+        raise
+    finally:
+        _record(endpoint, time.perf_counter() - start, call)
+        _maybe_export()
+
+
+def render_prometheus():
+    """Return every metric in Prometheus text exposition format"""
+    with _lock:
+        endpoints = {name: {**m, "buckets": list(m["buckets"])} for name, m in _endpoints.items()}
+        errors = dict(_errors)
+
+    lines = [
+        "# HELP finances_external_request_duration_seconds Latency of outbound calls.",
+        "# TYPE finances_external_request_duration_seconds histogram",
+    ]
+    for name, m in sorted(endpoints.items()):
+        for bound, count in zip(BUCKETS, m["buckets"]):
+            lines.append(f'finances_external_request_duration_seconds_bucket{{endpoint="{name}",le="{bound}"}} {count}')
+        lines.append(f'finances_external_request_duration_seconds_bucket{{endpoint="{name}",le="+Inf"}} {m["count"]}')
+        lines.append(f'finances_external_request_duration_seconds_sum{{endpoint="{name}"}} {m["sum"]:.6f}')
+        lines.append(f'finances_external_request_duration_seconds_count{{endpoint="{name}"}} {m["count"]}')
+
+    lines += ["# HELP finances_external_response_bytes_total Bytes received from outbound calls.",
+              "# TYPE finances_external_response_bytes_total counter"]
+    lines += [f'finances_external_response_bytes_total{{endpoint="{name}"}} {m["bytes"]}'
+              for name, m in sorted(endpoints.items()) if m["bytes"] is not None]
+
+    lines += ["# HELP finances_external_retries_total Retries made by outbound calls.",
+              "# TYPE finances_external_retries_total counter"]
+    lines += [f'finances_external_retries_total{{endpoint="{name}"}} {m["retries"]}'
+              for name, m in sorted(endpoints.items())]
+
+    lines += ["# HELP finances_external_errors_total Failed outbound calls by error class.",
+              "# TYPE finances_external_errors_total counter"]
+    lines += [f'finances_external_errors_total{{endpoint="{name}",error="{error}"}} {count}'
+              for (name, error), count in sorted(errors.items())]
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path=METRICS_FILE):
+    """Atomically write the metrics file, for the node_exporter textfile collector"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+
+
+def _maybe_export():
+    global _last_export
+    now = time.monotonic()
+    with _lock:
+        if now - _last_export < EXPORT_INTERVAL:
+            return
+        _last_export = now
+    try:
+        write_prometheus()
+    except OSError as e:
+        print(f"Could not write I/O metrics: {e}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port=METRICS_PORT, host="127.0.0.1"):
+    """Serve /metrics on a local port from a daemon thread; does nothing if unset or already running"""
+    global _server
+    if not port:
+        return
+    with _lock:
+        if _server is not None:
+            return
+        try:
+            _server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+        except OSError as e:
+            print(f"Could not start metrics server on port {port}: {e}")
+            _server = False  # do not retry on every rerun
+            return
+    threading.Thread(target=_server.serve_forever, name="io-metrics", daemon=True).start()
@@ -0,0 +1,42 @@
+import contextlib
+import datetime
+import os
+import sqlite3
+
+# On-disk cache for market data (FX rates, ...), shared by every session and kept across restarts
+DB_PATH = os.environ.get("FINANCES_LOCAL_DB", os.path.join(".cache", "market_data.sqlite"))
+
+
+@contextlib.contextmanager
+def connect():
+    """Open the local market data database, committing and closing it on exit"""
+    os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def missing_ranges(coverage, start, end, today, now, lookback_days, recheck_seconds):
+    """
+        Return the (start, end) ranges still to download for one series.
+
+        coverage is the stored (first, last, checked_at) of the series, or None; a range ending today is
+        re-checked once recheck_seconds have passed since the last check.
+    """
+    lookback = datetime.timedelta(days=lookback_days)
+    if coverage is None:
+        return [(start - lookback, end)]
+    first = datetime.date.fromisoformat(coverage[0])
+    last = datetime.date.fromisoformat(coverage[1])
+    checked_at = coverage[2]
+
+    missing = []
+    if start < first:
+        missing.append((start - lookback, first))
+    if end > last or (end >= today and now - checked_at > recheck_seconds):
+        missing.append((min(last, end) - lookback, end))
+    return missing
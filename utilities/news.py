@@ -0,0 +1,92 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import streamlit as st
+from utilities import cache, instrumentation, io_metrics, quotes
+
+NEWS_TTL_SECONDS = 3600
+# Only the first few articles of a ticker are considered
+MAX_ARTICLES = 5
+MAX_WORKERS = 4
+# Total time a render waits for news; late results are still cached for the next render
+TIME_BUDGET_SECONDS = 3.0
+
+
+def _is_valid(news):
+    """Validate that news has the expected structure AND a valid link"""
+    if not isinstance(news, dict) or not news.get('content'):
+        return False
+    content = news.get('content', {})
+    click_through = content.get("clickThroughUrl") or {}
+    link = click_through.get("url") if isinstance(click_through, dict) else None
+    return bool(link and link != "#" and link.startswith("http"))
+
+
+def fetch_news(ticker):
+    """Return the first valid article of a ticker, fetching its news list once"""
+    with io_metrics.observe("yahoo.news"):
+        articles = quotes.yfinance().Ticker(ticker).news or []
+    return next((news for news in articles[:MAX_ARTICLES] if _is_valid(news)), None)
+
+
+class NewsCache:
+    """Validated article per ticker, shared by all sessions, fetched on a bounded thread pool"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.items = {}  # ticker -> (article or None, fetched_at)
+        self.pending = {}  # ticker -> future, so concurrent sessions share one request
+        self.executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="news")
+
+    def _fetch(self, ticker):
+        try:
+            item = fetch_news(ticker)
+        except Exception as e:
+            print(f"Failed to fetch news for {ticker}: {e}")
+            item = None
+        with self.lock:
+            self.items[ticker] = (item, time.monotonic())
+            self.pending.pop(ticker, None)
+        return item
+
+    def get(self, tickers, budget):
+        now = time.monotonic()
+        futures = []
+        with self.lock:
+            for ticker in tickers:
+                cached = self.items.get(ticker)
+                if cached and now - cached[1] <= NEWS_TTL_SECONDS:
+                    continue
+                if ticker not in self.pending:
+                    self.pending[ticker] = self.executor.submit(self._fetch, ticker)
+                futures.append(self.pending[ticker])
+
+        instrumentation.record("news.cache", hit=not futures)
+        if futures:
+            with instrumentation.span("news.wait"):
+                wait(futures, timeout=budget)
+
+        with self.lock:
+            found = {ticker: self.items.get(ticker, (None,))[0] for ticker in tickers}
+        return {ticker: item for ticker, item in found.items() if item}
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+@st.cache_resource
+def _news_cache():
+    return NewsCache()
+
+
+def _clear_news():
+    _news_cache().clear()
+
+
+cache.register(_clear_news, cache.NEWS)
+
+
+def get_news(tickers, budget=TIME_BUDGET_SECONDS):
+    """Return {ticker: article} for the tickers with valid news, waiting at most budget seconds in total"""
+    return _news_cache().get(list(dict.fromkeys(tickers)), budget)
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Series longer than this are drawn with WebGL instead of SVG
+WEBGL_THRESHOLD = 1000
+# Bars beyond this are merged into the smallest of BAR_FREQUENCIES that fits
+MAX_BARS = 60
+BAR_FREQUENCIES = ("W", "M", "Q", "Y")
+# Share of the data span left free above and below the bars or line
+AXIS_PADDING = 0.1
+
+
+def lttb(x, y, threshold):
+    """
+        Indices of the points kept by Largest-Triangle-Three-Buckets downsampling.
+
+        The first and last points are always kept; every bucket in between keeps the point forming the
+        largest triangle with the previously kept point and the average of the next bucket, which
+        preserves peaks and troughs far better than taking every n-th point.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold is None or threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    keep = np.empty(threshold, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            avg_x, avg_y = x[end:edges[i + 2]].mean(), y[end:edges[i + 2]].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def split_at_zero(x, y):
+    """
+        Split a series into its non-negative and negative parts, for two filled traces.
+
+        A point is inserted at every zero crossing, interpolated between its neighbours; each part is the
+        whole series with the other sign's points set to NaN, so Plotly breaks the line there.
+        x is a datetime64 array; returns (x, positive y, negative y).
+    """
+    y = np.asarray(y, dtype=float)
+    t = np.asarray(x, dtype="datetime64[ns]").astype(np.int64)
+    positive = y >= 0
+    after = np.flatnonzero(positive[1:] != positive[:-1]) + 1
+
+    # Linear interpolation of where the segment [after - 1, after] reaches zero
+    y0, y1 = y[after - 1], y[after]
+    t0, t1 = t[after - 1], t[after]
+    t_cross = t0 + ((t1 - t0) * (-y0 / (y1 - y0))).astype(np.int64)
+
+    t = np.insert(t, after, t_cross)
+    y = np.insert(y, after, 0.0)
+    is_cross = np.zeros(len(y), dtype=bool)
+    is_cross[after + np.arange(len(after))] = True
+    positive = np.insert(positive, after, True)
+
+    x = t.astype("datetime64[ns]")
+    return x, np.where(positive | is_cross, y, np.nan), np.where(~positive | is_cross, y, np.nan)
+
+
+def scatter(n_points, **kwargs):
+    """Scatter trace, as Scattergl when the series is too long for SVG to redraw smoothly"""
+    trace = go.Scattergl if n_points > WEBGL_THRESHOLD else go.Scatter
+    return trace(**kwargs)
+
+
+def bar_frequency(dates, max_bars=MAX_BARS):
+    """
+        Smallest bucket (week, month, quarter or year) showing the dates in at most max_bars bars.
+
+        The span of the data stands in for the zoom level: None means one bar per row.
+    """
+    dates = pd.Series(dates).dropna()
+    if len(dates) <= max_bars:
+        return None
+    for freq in BAR_FREQUENCIES:
+        if dates.dt.to_period(freq).nunique() <= max_bars:
+            return freq
+    return BAR_FREQUENCIES[-1]
+
+
+def bin_bars(df, date, columns, max_bars=MAX_BARS):
+    """Sum columns per bar_frequency bucket, dated at the start of the bucket; small frames are returned as is"""
+    freq = bar_frequency(df[date], max_bars)
+    if freq is None:
+        return df
+    buckets = df[date].dt.to_period(freq).dt.start_time.rename(date)
+    return df.groupby(buckets)[columns].sum().reset_index()
+
+
+def axis_range(*values, padding=AXIS_PADDING):
+    """Axis [low, high] covering every value and zero, with some room for labels"""
+    values = np.concatenate([np.asarray(v, dtype=float).ravel() for v in values] + [[0.0]])
+    low, high = np.nanmin(values), np.nanmax(values)
+    pad = (high - low) * padding or 1.0
+    return [float(low - pad) if low < 0 else 0.0, float(high + pad)]
@@ -0,0 +1,121 @@
+import datetime
+import threading
+import time
+import pandas as pd
+from utilities import instrumentation, io_metrics, local_store, quotes
+
+# Markets close on weekends and holidays: fetch a few extra days so every date has a previous close
+LOOKBACK_DAYS = 7
+# A range ending today is re-checked at most every 10 minutes, like the live quotes
+TODAY_RECHECK_SECONDS = 600
+
+_lock = threading.Lock()
+
+
+def _init(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS price_history (
+            ticker TEXT NOT NULL,
+            date TEXT NOT NULL,
+            close REAL NOT NULL,
+            PRIMARY KEY (ticker, date)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS price_coverage (
+            ticker TEXT PRIMARY KEY,
+            first TEXT NOT NULL,
+            last TEXT NOT NULL,
+            checked_at REAL NOT NULL
+        )
+    """)
+
+
+@instrumentation.timed()
+def _download(tickers, start, end):
+    """Download daily closes of several tickers with one batched request"""
+    tickers = sorted(tickers)
+    with io_metrics.observe("yahoo.download_history") as call:
+        history = quotes.yfinance().download(
+            tickers=tickers,
+            start=start.isoformat(),
+            end=(end + datetime.timedelta(days=1)).isoformat(),  # end is exclusive
+            group_by="ticker",
+            auto_adjust=True,
+            threads=True,
+            progress=False
+        )
+        call.error = "EmptyResponse" if history.empty else None
+    if history.empty:
+        return []
+
+    rows = []
+    for ticker in tickers:
+        if isinstance(history.columns, pd.MultiIndex):
+            if ticker not in history.columns.get_level_values(0):
+                continue
+            closes = history[ticker]["Close"]
+        else:
+            closes = history["Close"]
+        closes = closes.dropna()
+        rows.extend((ticker, day.date().isoformat(), float(close)) for day, close in closes.items())
+    return rows
+
+
+def ensure_history(tickers, start, end):
+    """Make sure the store covers [start, end] for every ticker, downloading only the missing days"""
+    tickers = {t for t in tickers if t}
+    if not tickers:
+        return
+    today = datetime.date.today()
+    end = min(end, today)
+    start = min(start, end)
+
+    with _lock, local_store.connect() as conn:
+        _init(conn)
+        coverage = {row[0]: row[1:] for row in conn.execute("SELECT ticker, first, last, checked_at FROM price_coverage")}
+        now = time.time()
+
+        # Tickers missing the same range share a single download
+        to_fetch = {}
+        for ticker in tickers:
+            for missing in local_store.missing_ranges(coverage.get(ticker), start, end, today, now,
+                                                      LOOKBACK_DAYS, TODAY_RECHECK_SECONDS):
+                to_fetch.setdefault(missing, set()).add(ticker)
+
+        for (fetch_start, fetch_end), group in to_fetch.items():
+            try:
+                rows = _download(group, fetch_start, fetch_end)
+            except Exception as e:
+                print(f"Price history fetch failed: {e}")
+                continue
+            conn.executemany("INSERT OR REPLACE INTO price_history (ticker, date, close) VALUES (?, ?, ?)", rows)
+            for ticker in group:
+                old = coverage.get(ticker)
+                first = min(fetch_start.isoformat(), old[0]) if old else fetch_start.isoformat()
+                last = max(fetch_end.isoformat(), old[1]) if old else fetch_end.isoformat()
+                conn.execute("INSERT OR REPLACE INTO price_coverage (ticker, first, last, checked_at) "
+                             "VALUES (?, ?, ?, ?)", (ticker, first, last, now))
+
+
+@instrumentation.timed()
+def get_closes(tickers, start, end):
+    """Return daily closes as a calendar-day by ticker frame, carrying the last close over non-trading days"""
+    tickers = sorted({t for t in tickers if t})
+    days = pd.date_range(start, end, freq="D")
+    if not tickers:
+        return pd.DataFrame(index=days)
+    ensure_history(tickers, start, end)
+    placeholders = ",".join("?" * len(tickers))
+    with local_store.connect() as conn:
+        _init(conn)
+        history = pd.read_sql_query(
+            f"SELECT ticker, date, close FROM price_history "
+            f"WHERE ticker IN ({placeholders}) AND date BETWEEN ? AND ?",
+            conn,
+            params=[*tickers, (start - datetime.timedelta(days=LOOKBACK_DAYS)).isoformat(), end.isoformat()],
+        )
+    history["date"] = pd.to_datetime(history["date"])
+    closes = history.pivot_table(index="date", columns="ticker", values="close", aggfunc="last")
+    closes = closes.reindex(columns=tickers)
+    return closes.reindex(closes.index.union(days)).sort_index().ffill().reindex(days)
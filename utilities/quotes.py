@@ -0,0 +1,141 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import streamlit as st
+from utilities import cache, instrumentation, io_metrics
+
+QUOTE_TTL_SECONDS = 600
+# A ticker Yahoo could not price is retried sooner, in the background
+FAILED_TTL_SECONDS = 60
+
+
+def yfinance():
+    """The yfinance module, imported on first use: it is slow to import and no page needs it before login"""
+    import yfinance
+    return yfinance
+
+
+@instrumentation.timed()
+def fetch_prices(tickers):
+    """Return {ticker: last close} with one batched download, falling back to one request per ticker"""
+    yf = yfinance()
+    tickers = list(tickers)
+    ticker_prices = {}
+    try:
+        # Single API call to fetch all current prices
+        with io_metrics.observe("yahoo.download") as call:
+            current_prices = yf.download(
+                tickers=tickers,
+                period="1d",
+                group_by="ticker",
+                auto_adjust=True,
+                prepost=True,
+                threads=True,
+                progress=False  # Suppress progress bar
+            )
+            # yfinance reports failures with an empty frame instead of raising
+            call.error = "EmptyResponse" if current_prices.empty else None
+
+        if len(tickers) == 1:
+            # Single ticker case - data structure is different
+            ticker = tickers[0]
+            # Check if we have any data and a Close column
+            if not current_prices.empty:
+                if "Close" in current_prices.columns:
+                    # Flat structure: columns are ['Close', 'Open', etc.]
+                    ticker_prices[ticker] = current_prices["Close"].iloc[-1]
+                elif isinstance(current_prices.columns, pd.MultiIndex):
+                    # Sometimes even single ticker returns MultiIndex
+                    ticker_prices[ticker] = current_prices[ticker]["Close"].iloc[-1]
+        else:
+            # Multiple tickers case
+            for ticker in tickers:
+                try:
+                    if ticker in current_prices.columns.get_level_values(0):
+                        close_data = current_prices[ticker]["Close"].dropna()
+                        if not close_data.empty:
+                            ticker_prices[ticker] = close_data.iloc[-1]
+                except (KeyError, IndexError):
+                    print(f"Could not extract price for {ticker}")
+                    continue
+
+    except Exception as e:
+        print(f"Bulk fetch failed: {e}")
+        # Fallback to one request per ticker if bulk fetch fails
+        for ticker in tickers:
+            try:
+                with io_metrics.observe("yahoo.history"):
+                    ticker_prices[ticker] = yf.Ticker(ticker).history(period="1d")["Close"].iloc[-1]
+            except Exception as ticker_error:
+                print(f"Failed to fetch {ticker}: {ticker_error}")
+
+    return {ticker: float(price) for ticker, price in ticker_prices.items() if pd.notna(price)}
+
+
+class QuoteCache:
+    """Last known price per ticker, shared by all sessions; expired tickers are refreshed in the background"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.prices = {}  # ticker -> (price or None, fetched_at)
+        self.refreshing = set()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="quotes")
+
+    def _expired(self, ticker, now):
+        price, fetched_at = self.prices[ticker]
+        ttl = QUOTE_TTL_SECONDS if price is not None else FAILED_TTL_SECONDS
+        return now - fetched_at > ttl
+
+    def _store(self, tickers, prices):
+        now = time.monotonic()
+        with self.lock:
+            for ticker in tickers:
+                self.prices[ticker] = (prices.get(ticker), now)
+
+    def _refresh(self, tickers):
+        try:
+            self._store(tickers, fetch_prices(tickers))
+        finally:
+            with self.lock:
+                self.refreshing.difference_update(tickers)
+
+    def get(self, tickers):
+        """Return {ticker: price} at once; only tickers never seen before wait for Yahoo"""
+        tickers = list(dict.fromkeys(tickers))
+        now = time.monotonic()
+        with self.lock:
+            missing = [t for t in tickers if t not in self.prices]
+            expired = [t for t in tickers
+                       if t in self.prices and t not in self.refreshing and self._expired(t, now)]
+            self.refreshing.update(expired)
+
+        instrumentation.record("quotes.cache", hit=not missing)
+        if missing:
+            self._store(missing, fetch_prices(missing))
+        if expired:
+            self.executor.submit(self._refresh, expired)
+
+        with self.lock:
+            return {t: self.prices[t][0] for t in tickers if self.prices.get(t, (None,))[0] is not None}
+
+    def clear(self):
+        with self.lock:
+            self.prices.clear()
+
+
+@st.cache_resource
+def _quote_cache():
+    return QuoteCache()
+
+
+def _clear_quotes():
+    _quote_cache().clear()
+
+
+cache.register(_clear_quotes, cache.PRICES)
+
+
+def get_prices(tickers):
+    """Return the last known price of every ticker, serving stale prices while they are refreshed"""
+    return _quote_cache().get(tickers)
@@ -0,0 +1,28 @@
+from utilities import schema
+
+
+def insert_transactions(conn, rows):
+    """Insert one row (a dict) or many (a list of dicts, sent as one executemany)"""
+    conn.execute(schema.INSERT_TRANSACTION, rows)
+
+
+def close_position(conn, owner, stock, price_sell, date_sell, quantity_sell, dividends):
+    """Close the owner's open lot of a stock; returns the number of rows closed"""
+    return conn.execute(schema.CLOSE_POSITION, {
+        "lot_owner": owner,
+        "lot_stock": stock,
+        "price_sell": price_sell,
+        "date_sell": date_sell,
+        "quantity_sell": quantity_sell,
+        "dividends": dividends,
+    }).rowcount
+
+
+def add_to_position(conn, owner, stock, price, quantity):
+    """Buy more of the owner's open lot at price, averaging its buy price; returns the number of rows updated"""
+    return conn.execute(schema.ADD_TO_POSITION, {
+        "lot_owner": owner,
+        "lot_stock": stock,
+        "add_price": price,
+        "add_quantity": quantity,
+    }).rowcount
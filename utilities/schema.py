@@ -0,0 +1,118 @@
+import functools
+import numpy as np
+import pandas as pd
+
+# Canonical dtypes of the transactions frame; every loader returns it in this shape so
+# nothing downstream has to parse or cast again
+CATEGORY_COLUMNS = ["stock", "ticker", "currency", "owner"]
+DATE_COLUMNS = ["date_buy", "date_sell"]
+FLOAT_COLUMNS = ["price_buy", "quantity_buy", "price_sell", "quantity_sell", "dividends"]
+
+
+def normalise_transactions(df):
+    """Return a raw transactions frame cast to the canonical dtypes and in period order"""
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column])
+    for column in FLOAT_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column]).astype("Float64")
+    if "updated_at" in df.columns:
+        # SQLite returns timestamps as text
+        df["updated_at"] = pd.to_datetime(df["updated_at"], utc=True)
+    return order_by_period(df)
+
+
+def order_by_period(df):
+    """Order rows by date_sell, then id, with open rows last, so a period is a contiguous tail of the frame"""
+    keys = [column for column in ("date_sell", "id") if column in df.columns]
+    return df.sort_values(keys, na_position="last", kind="stable", ignore_index=True) if keys else df
+
+
+def is_period_ordered(sell):
+    """Tell whether a date_sell array is ascending with every NaT at the end"""
+    closed = int((~np.isnat(sell)).sum())
+    return bool(np.isnat(sell[closed:]).all() and (sell[1:closed] >= sell[:max(closed - 1, 0)]).all())
+
+
+def memory_report(df):
+    """Return dtype and deep memory size in KB of every column, with a total row"""
+    sizes = df.memory_usage(index=True, deep=True)
+    report = pd.DataFrame({
+        "dtype": [str(df[c].dtype) if c in df.columns else "index" for c in sizes.index],
+        "kb": sizes.to_numpy() / 1024,
+    }, index=sizes.index)
+    report.loc["total"] = ["", report["kb"].sum()]
+    return report
+
+
+WRITE_COLUMNS = ["stock", "ticker", "price_buy", "date_buy", "quantity_buy",
+                 "price_sell", "date_sell", "quantity_sell", "currency", "dividends", "owner"]
+# Built on first use, so that importing this module does not import SQLAlchemy
+_TABLE_ATTRIBUTES = ("metadata", "transactions", "INSERT_TRANSACTION", "CLOSE_POSITION", "ADD_TO_POSITION")
+
+
+@functools.cache
+def _tables():
+    from sqlalchemy import (Column, Date, DateTime, Float, Index, Integer, MetaData, String, Table, bindparam,
+                            func, insert, update)
+
+    # The transactions table, declared once instead of reflected from the database on every write
+    metadata = MetaData()
+    transactions = Table(
+        "transactions", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("stock", String),
+        Column("ticker", String),
+        Column("price_buy", Float),
+        Column("date_buy", Date),
+        Column("quantity_buy", Float),
+        Column("price_sell", Float),
+        Column("date_sell", Date),
+        Column("quantity_sell", Float),
+        Column("currency", String(3)),
+        Column("dividends", Float),
+        # sql/001_transactions_updated_at.sql
+        Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+        # sql/002_transactions_owner.sql
+        Column("owner", String, nullable=False),
+        Index("transactions_owner_date_sell_idx", "owner", "date_sell"),
+    )
+
+    # Statements are built once; SQLAlchemy compiles each a single time per dialect and reuses it
+    insert_transaction = insert(transactions).values({column: bindparam(column) for column in WRITE_COLUMNS})
+
+    open_lot = ((transactions.c.owner == bindparam("lot_owner")) & (transactions.c.stock == bindparam("lot_stock"))
+                & transactions.c.date_sell.is_(None))
+
+    close_position = update(transactions).where(open_lot).values(
+        price_sell=bindparam("price_sell"),
+        quantity_sell=bindparam("quantity_sell"),
+        date_sell=bindparam("date_sell"),
+        dividends=bindparam("dividends"),
+    )
+
+    # The lot keeps its average buy price over the old and the added quantity
+    add_quantity = bindparam("add_quantity", type_=Float)
+    add_to_position = update(transactions).where(open_lot).values(
+        price_buy=(transactions.c.price_buy * transactions.c.quantity_buy +
+                   bindparam("add_price", type_=Float) * add_quantity) / (transactions.c.quantity_buy + add_quantity),
+        quantity_buy=transactions.c.quantity_buy + add_quantity,
+    )
+
+    return {
+        "metadata": metadata,
+        "transactions": transactions,
+        "INSERT_TRANSACTION": insert_transaction,
+        "CLOSE_POSITION": close_position,
+        "ADD_TO_POSITION": add_to_position,
+    }
+
+
+def __getattr__(name):
+    if name in _TABLE_ATTRIBUTES:
+        return _tables()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
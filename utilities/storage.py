@@ -0,0 +1,176 @@
+"""
+    Where the transactions live: Postgres in production, a local SQLite file in development.
+
+    The development database has the same table and is seeded from a Parquet snapshot of production, so
+    local runs and profiling go through the real load and write paths without any network.
+
+    python -m utilities.storage snapshot               # dump production to SNAPSHOT_PATH
+    python -m utilities.storage seed                   # rebuild the development database from it
+    python -m utilities.storage seed --owner NAME      # for a snapshot taken before transactions had an owner
+
+    seed only rebuilds SQLite databases; filling any other database needs --force and keeps its table.
+"""
+import argparse
+import os
+import sys
+import pandas as pd
+import streamlit as st
+from utilities import schema
+
+# Set FINANCES_DEV=1 to run the app on the development database
+DEV_MODE = os.environ.get("FINANCES_DEV") == "1"
+DEV_DATABASE_URL = os.environ.get("FINANCES_DEV_DB", "sqlite:///" + os.path.join(".cache", "finances_dev.sqlite"))
+SNAPSHOT_PATH = os.environ.get("FINANCES_SNAPSHOT", os.path.join(".cache", "transactions.parquet"))
+
+# sql/001_transactions_updated_at.sql in SQLite trigger syntax
+_SQLITE_TOUCH_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS transactions_touch_updated_at
+    AFTER UPDATE ON transactions FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+    BEGIN
+        UPDATE transactions SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+    END
+"""
+
+_dev = DEV_MODE
+
+
+def use_dev_database():
+    """Switch this process to the development database"""
+    global _dev
+    _dev = True
+
+
+def database_url():
+    """URL of the database this process runs on"""
+    return DEV_DATABASE_URL if _dev else st.secrets["db_connection"]
+
+
+def engine_options(url, settings):
+    """create_engine keyword arguments for the dialect of url, from the pool settings"""
+    options = {"pool_pre_ping": True}
+    if url == "sqlite://" or ":memory:" in url:
+        # An in-memory database lives in a single connection: keep SQLAlchemy's default pool
+        return options
+    options.update(
+        pool_size=int(settings["pool_size"]),
+        max_overflow=int(settings["max_overflow"]),
+        pool_timeout=int(settings["pool_timeout"]),
+        pool_recycle=int(settings["pool_recycle"]),
+    )
+    if url.startswith("postgres"):
+        # Only Postgres takes server options at connect time
+        options["connect_args"] = {"options": f"-c statement_timeout={int(settings['statement_timeout_ms'])}"}
+    return options
+
+
+def create_database_engine(url, **options):
+    """create_engine, making the folder of a SQLite file first"""
+    from sqlalchemy import create_engine
+    if url.startswith("sqlite:///") and ":memory:" not in url:
+        os.makedirs(os.path.dirname(url[len("sqlite:///"):]) or ".", exist_ok=True)
+    return create_engine(url, **options)
+
+
+def _parquet():
+    """pyarrow.parquet, an optional dependency only needed for snapshots"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet snapshots need pyarrow: pip install pyarrow") from None
+    return pq
+
+
+def read_snapshot(path=SNAPSHOT_PATH):
+    """Read a Parquet snapshot, memory-mapped, as a canonical transactions frame"""
+    pq = _parquet()
+    return schema.normalise_transactions(pq.read_table(path, memory_map=True).to_pandas())
+
+
+def write_snapshot(engine, path=SNAPSHOT_PATH):
+    """Dump the whole transactions table to a Parquet file; returns the number of rows"""
+    from sqlalchemy import text
+    _parquet()
+    df = pd.read_sql(text("SELECT * FROM transactions ORDER BY id"), engine)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    df.to_parquet(path, index=False)
+    return len(df)
+
+
+def create_tables(engine):
+    """Create the transactions table on a new development database"""
+    from sqlalchemy import text
+    schema.metadata.create_all(engine)
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.execute(text(_SQLITE_TOUCH_TRIGGER))
+
+
+def seed(engine, path=SNAPSHOT_PATH, owner=None, force=False):
+    """
+        Rebuild the development transactions table from the snapshot; returns the number of rows.
+
+        owner is given to every row of a snapshot taken before transactions had an owner. Any database but
+        SQLite is refused unless force is set, and even then its table is only emptied, never dropped.
+    """
+    from sqlalchemy import inspect, text
+    development = engine.dialect.name == "sqlite"
+    if not development and not force:
+        raise ValueError(f"Refusing to seed {engine.url.render_as_string()}: only SQLite development databases "
+                         "are seeded without --force")
+    df = _parquet().read_table(path, memory_map=True).to_pandas()
+    if "owner" not in df.columns:
+        if owner is None:
+            raise ValueError(f"{path} has no owner column: "
+                             "seed it with python -m utilities.storage seed --owner NAME")
+        df["owner"] = owner
+    if development:
+        # Dropped rather than emptied, so a table created by an older schema gets the current columns
+        schema.transactions.drop(engine, checkfirst=True)
+    create_tables(engine)
+    columns = [c["name"] for c in inspect(engine).get_columns("transactions")]
+    with engine.begin() as conn:
+        if not development:
+            conn.execute(text("DELETE FROM transactions"))
+        df[[c for c in df.columns if c in columns]].to_sql("transactions", conn, if_exists="append", index=False)
+    return len(df)
+
+
+def prepare_dev_database(engine):
+    """Create the development database on first use, from the snapshot when there is one"""
+    from sqlalchemy import inspect
+    if inspect(engine).has_table("transactions"):
+        if "owner" not in {c["name"] for c in inspect(engine).get_columns("transactions")}:
+            raise RuntimeError("The development database predates transaction owners: rebuild it with "
+                               "python -m utilities.storage seed --owner NAME")
+        return
+    if os.path.exists(SNAPSHOT_PATH):
+        seed(engine)
+    else:
+        create_tables(engine)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["snapshot", "seed"])
+    parser.add_argument("--url", help="database to read (snapshot) or fill (seed); defaults to "
+                                      "db_connection in secrets.toml for snapshot and the dev database for seed")
+    parser.add_argument("--path", default=SNAPSHOT_PATH, help="Parquet snapshot file")
+    parser.add_argument("--owner", help="seed: owner of the rows of a snapshot without an owner column")
+    parser.add_argument("--force", action="store_true", help="seed: allow replacing the rows of a non-SQLite database")
+    args = parser.parse_args(argv)
+
+    if args.command == "snapshot":
+        engine = create_database_engine(args.url or database_url())
+        print(f"Wrote {write_snapshot(engine, args.path)} transactions to {args.path}")
+    else:
+        url = args.url or DEV_DATABASE_URL
+        try:
+            rows = seed(create_database_engine(url), args.path, args.owner, args.force)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Loaded {rows} transactions into {url}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())